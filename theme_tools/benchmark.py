@@ -0,0 +1,287 @@
+# Benchmarks for the theme test tool
+# recolor: compares the per-pixel recolor loop the tool used to run with the band based recolor_image on real assets
+#          (the pager_custom glyphs that ship with this repo and, optionally, every PNG of a theme)
+# suite:   generates a synthetic theme of configurable size and times theme loading and headless frame rendering,
+#          the results are written as JSON so runs of different versions can be compared
+import argparse
+import copy
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import PIL
+from PIL import Image, ImageDraw
+
+import theme_test
+
+
+FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts", "pager_custom")
+
+
+# the original recolor_image implementation, kept as reference for output comparison and timing
+def recolor_image_per_pixel(image: Image.Image, new_color: str) -> Image.Image:
+    palette = theme_test.palette
+    recolored_image = image.copy().convert('RGBA')
+    pixels = recolored_image.load()
+    if new_color not in palette:
+        return recolored_image
+
+    new_r = palette[new_color].get('r', 0)
+    new_g = palette[new_color].get('g', 0)
+    new_b = palette[new_color].get('b', 0)
+
+    for y in range(recolored_image.height):
+        for x in range(recolored_image.width):
+            r, g, b, a = pixels[x, y]
+            if a == 0:
+                continue  # skip transparent pixels
+            pixels[x, y] = (new_r, new_g, new_b, a)
+    return recolored_image
+
+
+# collect every PNG below the given directories
+def find_assets(directories: list) -> list:
+    assets = []
+    for directory in directories:
+        for dir_path, _, file_names in os.walk(directory):
+            for file_name in sorted(file_names):
+                if file_name.lower().endswith('.png'):
+                    assets.append(os.path.join(dir_path, file_name))
+    return assets
+
+
+# time a function over all images, returns the best total of the given number of rounds
+def time_recolor(function, images: list, color: str, rounds: int) -> float:
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for image in images:
+            function(image, color)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_recolor(args):
+    directories = [FONT_DIR]
+    if args.theme:
+        directories.append(args.theme)
+    asset_paths = find_assets(directories)
+    if not asset_paths:
+        print("No PNG assets found to benchmark")
+        return 1
+
+    images = [Image.open(path).convert('RGBA') for path in asset_paths]
+    total_pixels = sum(image.width * image.height for image in images)
+
+    theme_test.palette = {"bench": {'r': 255, 'g': 128, 'b': 0}}
+    # the fallback check below would log a warning per image
+    theme_test.logger.setLevel(logging.ERROR)
+
+    # both implementations have to produce the same pixels, also for the "color not in palette" fallback
+    for color in ("bench", "missing"):
+        for path, image in zip(asset_paths, images):
+            if recolor_image_per_pixel(image, color).tobytes() != theme_test.recolor_image(image, color).tobytes():
+                print(f"Output mismatch for '{path}' with color '{color}'")
+                return 1
+
+    before = time_recolor(recolor_image_per_pixel, images, "bench", args.rounds)
+    after = time_recolor(theme_test.recolor_image, images, "bench", args.rounds)
+
+    print(f"Assets: {len(images)} images, {total_pixels} pixels")
+    print(f"per-pixel recolor: {before * 1000:.2f} ms")
+    print(f"band recolor:      {after * 1000:.2f} ms")
+    print(f"speedup:           {before / after:.1f}x")
+    return 0
+
+
+# write a synthetic theme with the given size to theme_path, the layout follows the structure of real themes:
+# theme.json with a color palette and status bar file, one JSON file per menu and a directory of PNG assets
+def generate_synthetic_theme(theme_path: str, menus: int, pages: int, items_per_page: int, layers_per_item: int, text_length: int, assets: int):
+    os.makedirs(os.path.join(theme_path, "assets"), exist_ok=True)
+    os.makedirs(os.path.join(theme_path, "menus"), exist_ok=True)
+
+    def write_json(relative_path, data):
+        with open(os.path.join(theme_path, relative_path), 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+
+    # assets: one full screen background, the rest are icons and highlights of different sizes
+    asset_paths = []
+    for index in range(max(assets, 1)):
+        if index == 0:
+            size = (theme_test.PAGER_SCREEN_WIDTH, theme_test.PAGER_SCREEN_HEIGHT)
+        else:
+            size = (16 + (index * 37) % 200, 12 + (index * 13) % 24)
+        image = Image.new('RGBA', size, (0, 0, 0, 0))
+        ImageDraw.Draw(image).rounded_rectangle((0, 0, size[0] - 1, size[1] - 1), radius=min(size) // 3, fill=((index * 53) % 256, (index * 91) % 256, (index * 29) % 256, 255))
+        asset_path = f"assets/asset_{index}.png"
+        image.save(os.path.join(theme_path, asset_path))
+        asset_paths.append(asset_path)
+
+    palette = {f"color_{index}": {'r': (index * 70) % 256, 'g': (index * 130) % 256, 'b': (index * 200) % 256} for index in range(8)}
+    write_json("palette.json", palette)
+
+    def status_item(x, states):
+        return {'x': x, 'y': 2, 'layers': {state: [{'image_path': asset_paths[(index + 1) % len(asset_paths)], 'x': 0, 'y': 0}] for index, state in enumerate(states)}}
+    write_json("status_bar.json", {'status_bar_items': {
+        'Time': {'x': 0, 'y': 0},
+        'Battery': status_item(440, [theme_test.BATTERY, "low"]),
+        'Volume': status_item(400, [theme_test.VOLUME, "off"]),
+        'Brightness': status_item(360, [theme_test.BRIGHTNESS, "50"]),
+        'Vibrate': status_item(320, [theme_test.VIBRATE, "off"]),
+    }})
+
+    text = ("Synthetic menu item " * (text_length // 20 + 1))[:text_length]
+
+    def menu_item(menu_index, item_index):
+        layers = []
+        selected_layers = [{'image_path': asset_paths[1 % len(asset_paths)], 'x': 0, 'y': 0, 'recolor_palette': "color_1"}]
+        for layer_index in range(layers_per_item):
+            if layer_index % 2:
+                layer = {'text': text, 'x': 20, 'y': 2, 'text_size': ("small", "medium", "large")[layer_index % 3], 'text_color_palette': f"color_{layer_index % 8}"}
+            else:
+                layer = {'image_path': asset_paths[(item_index + layer_index) % len(asset_paths)], 'x': layer_index * 4, 'y': 2}
+            layers.append(layer)
+            selected_layers.append(dict(layer, recolor_palette=f"color_{(layer_index + 2) % 8}") if 'image_path' in layer else layer)
+        return {'x': 8, 'y': 24 + item_index * 28, 'target': f"menu_{(menu_index + 1) % menus}", 'layers': layers, 'selected_layers': selected_layers}
+
+    theme = {'color_palette': "palette.json", 'status_bars': {'default': "status_bar.json"}}
+    for menu_index in range(menus):
+        menu_data = {
+            'screen_name': f"Menu {menu_index}",
+            'status_bar': "default",
+            'background': {'background_color': {'r': 16, 'g': 16, 'b': 32}, 'layers': [{'image_path': asset_paths[0], 'x': 0, 'y': 0}]},
+        }
+        if pages > 1:
+            menu_data['pages'] = [{'menu_items': [menu_item(menu_index, item_index) for item_index in range(items_per_page)]} for _ in range(pages)]
+        else:
+            menu_data['menu_items'] = [menu_item(menu_index, item_index) for item_index in range(items_per_page)]
+        write_json(f"menus/menu_{menu_index}.json", menu_data)
+        theme[f"menu_{menu_index}_path"] = f"menus/menu_{menu_index}.json"
+    write_json("theme.json", theme)
+
+
+# run function the given number of rounds, setup runs before every round and isn't timed
+def time_function(function, rounds: int, setup=None) -> dict:
+    durations = []
+    for _ in range(rounds):
+        argument = setup() if setup else None
+        start = time.perf_counter()
+        function(argument)
+        durations.append(time.perf_counter() - start)
+    return {
+        'rounds': rounds,
+        'min_ms': min(durations) * 1000,
+        'median_ms': statistics.median(durations) * 1000,
+        'mean_ms': statistics.mean(durations) * 1000,
+    }
+
+
+def bench_suite(args):
+    theme_test.logger.setLevel(logging.ERROR)
+    parameters = {
+        'menus': args.menus,
+        'pages': args.pages,
+        'items_per_page': args.items_per_page,
+        'layers_per_item': args.layers_per_item,
+        'text_length': args.text_length,
+        'assets': args.assets,
+    }
+
+    with tempfile.TemporaryDirectory(prefix="synthetic_theme_") as theme_path:
+        generate_synthetic_theme(theme_path, **parameters)
+        results = {}
+
+        # cold: the JSON include cache is emptied before every round, cached: a reload of an unchanged theme
+        def clear_include_cache():
+            theme_test.json_include_cache.clear()
+        results['load_theme'] = time_function(lambda _: theme_test.load_theme(theme_path), args.rounds, clear_include_cache)
+        results['load_theme_cached'] = time_function(lambda _: theme_test.load_theme(theme_path), args.rounds)
+
+        with open(os.path.join(theme_path, "theme.json"), encoding='utf-8') as f:
+            raw_theme = json.load(f)
+
+        def fresh_raw_theme():
+            clear_include_cache()
+            return copy.deepcopy(raw_theme)
+        results['expand_dict'] = time_function(lambda raw: theme_test.expand_dict(raw, theme_path), args.rounds, fresh_raw_theme)
+
+        # create_menus only creates lazy menus, materializing all of them is what the old eager version did
+        def create_all_menus(theme_data):
+            for lazy in theme_test.create_menus(theme_data, theme_path).values():
+                lazy.materialize()
+        results['create_menus'] = time_function(lambda theme_data: theme_test.create_menus(theme_data, theme_path), args.rounds, lambda: theme_test.load_theme(theme_path))
+        results['create_menus_materialized'] = time_function(create_all_menus, args.rounds, lambda: theme_test.load_theme(theme_path))
+
+        theme_data = theme_test.load_theme(theme_path)
+        theme_test.menus = theme_test.create_menus(theme_data, theme_path)
+        theme_test.status_bars = theme_test.create_status_bars(theme_data, theme_path)
+
+        images = [theme_test.open_image(os.path.join(theme_path, "assets", name)) for name in sorted(os.listdir(os.path.join(theme_path, "assets")))]
+        results['recolor_image'] = time_function(lambda _: [theme_test.recolor_image(image, "color_3") for image in images], args.rounds)
+
+        # full headless frame (render_menu + draw_menu_items + draw_status_bar) over a spread of states
+        states = theme_test.list_menu_states(theme_test.menus)
+        sample = states[::max(1, len(states) // args.frames)][:args.frames]
+
+        def render_frames(_):
+            for state in sample:
+                theme_test.set_menu_state(*state)
+                theme_test.render_frame(theme_test.menu.model)
+        frames = time_function(render_frames, args.rounds)
+        results['frame'] = {key: value / len(sample) if key.endswith('_ms') else value for key, value in frames.items()}
+        results['frame']['frames_per_round'] = len(sample)
+
+    report = {
+        'benchmark': "theme_test suite",
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        'python': platform.python_version(),
+        'pillow': PIL.__version__,
+        'platform': platform.platform(),
+        'parameters': parameters,
+        'states': len(states),
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        for name, result in results.items():
+            print(f"{name:28} median {result['median_ms']:9.2f} ms   min {result['min_ms']:9.2f} ms")
+        print(f"Results written to {args.output}")
+    else:
+        print(output)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the Theme Test Tool")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    recolor_parser = subparsers.add_parser("recolor", help="Compare the per-pixel and band based recolor_image on real assets")
+    recolor_parser.add_argument("--theme", type=str, default=None, help="Theme directory whose PNG assets are added to the benchmark")
+    recolor_parser.add_argument("--rounds", type=int, default=5, help="Number of rounds, the best one is reported (default: 5)")
+
+    suite_parser = subparsers.add_parser("suite", help="Time theme loading and frame rendering on a synthetic theme")
+    suite_parser.add_argument("--menus", type=int, default=50, help="Number of menus (default: 50)")
+    suite_parser.add_argument("--pages", type=int, default=1, help="Pages per menu, 1 puts the items directly in the menu (default: 1)")
+    suite_parser.add_argument("--items-per-page", type=int, default=6, help="Menu items per page (default: 6)")
+    suite_parser.add_argument("--layers-per-item", type=int, default=4, help="Layers per menu item, alternating image and text (default: 4)")
+    suite_parser.add_argument("--text-length", type=int, default=16, help="Characters per text layer (default: 16)")
+    suite_parser.add_argument("--assets", type=int, default=40, help="Number of PNG assets (default: 40)")
+    suite_parser.add_argument("--frames", type=int, default=50, help="Number of states rendered per round for the frame timing (default: 50)")
+    suite_parser.add_argument("--rounds", type=int, default=5, help="Number of rounds per measurement (default: 5)")
+    suite_parser.add_argument("--output", "-o", type=str, default=None, help="Write the JSON results to this file instead of stdout")
+
+    args = parser.parse_args()
+    if args.benchmark == "recolor":
+        return bench_recolor(args)
+    return bench_suite(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
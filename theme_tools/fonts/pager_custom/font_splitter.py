@@ -1,7 +1,15 @@
-# Takes in a png file where each character is in a grid and splits it into individual character pngs
+# Takes in png files where each character is in a grid and packs the characters into one atlas image per sheet
 # Takes in a optional string wich describes the order of characters in the grid
-# Automatically calculates the size of each character based on the grid size
+# Automatically calculates the size of each character cell based on the grid size (or takes --cell-width) and finds
+# the real glyph bounds inside every cell from the alpha channel
+#
+# Every sheet produces <name>-atlas.png next to it (or in --output-folder) plus <name>-atlas.json with the metrics of
+# every glyph. The same metrics are stored in the "glyph_metrics" text chunk of the atlas, so the renderer gets the
+# pixels and the metrics of a whole font size in a single read.
 from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+from concurrent.futures import ProcessPoolExecutor
+import json
 import os
 import sys
 import argparse
@@ -9,55 +17,172 @@ import argparse
 
 standard_char_order = " ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789!@#$%^&*()+=[]{},;.:-_\\/"
 
+ATLAS_METRICS_KEY = "glyph_metrics"
+ATLAS_PADDING = 1
+
+
+
+# (left, right) of every grid cell
+def cell_columns(cell_width: int, num_chars: int) -> list:
+    return [(index * cell_width, (index + 1) * cell_width) for index in range(num_chars)]
+
+# bounds of the non-transparent pixels of every cell, the alpha channel is scanned per column and row by Pillow
+# (getbbox on the alpha band) instead of pixel by pixel in Python; empty cells like the space have no bounds
+def glyph_bounds(alpha: Image.Image, columns: list) -> list:
+    return [alpha.crop((left, 0, right, alpha.height)).getbbox() for left, right in columns]
+
+# atlas name for a sheet, "small-font-Sheet.png" becomes "small-font-atlas"
+def atlas_name(sheet_path: str) -> str:
+    name = os.path.splitext(os.path.basename(sheet_path))[0]
+    if name.lower().endswith("-sheet"):
+        name = name[:-len("-sheet")]
+    return f"{name}-atlas"
+
+# split one sheet and pack its glyphs into a single row atlas, returns a summary line
+def build_atlas(sheet_path: str, output_folder: str, char_order: str, cell_width=None, split_glyphs: bool = False) -> str:
+    with Image.open(sheet_path) as sheet_image:
+        sheet = sheet_image.convert('RGBA')
+    img_width, img_height = sheet.size
+    num_chars = len(char_order)
+    char_width = cell_width if cell_width else img_width // num_chars
+    if char_width < 1 or char_width * num_chars > img_width:
+        raise ValueError(f"{sheet_path} is {img_width}px wide, too narrow for {num_chars} characters of {char_width}px")
+    leftover = img_width - char_width * num_chars
+    note = f", {leftover}px at the right edge ignored" if leftover else ""
+
+    columns = cell_columns(char_width, num_chars)
+    bounds = glyph_bounds(sheet.getchannel('A'), columns)
+
+    # pack the trimmed glyphs left to right with some padding so filtering never bleeds between glyphs
+    glyphs = {}
+    placements = []
+    atlas_x = 0
+    for char, (left, right), bbox in zip(char_order, columns, bounds):
+        metrics = {"x": 0, "y": 0, "width": 0, "height": 0, "offset_x": 0, "offset_y": 0, "advance": right - left}
+        if bbox is not None:
+            glyph_left, glyph_top, glyph_right, glyph_bottom = bbox
+            metrics.update(x=atlas_x, y=0, width=glyph_right - glyph_left, height=glyph_bottom - glyph_top,
+                           offset_x=glyph_left, offset_y=glyph_top)
+            placements.append(((left + glyph_left, glyph_top, left + glyph_right, glyph_bottom), atlas_x))
+            atlas_x += metrics["width"] + ATLAS_PADDING
+        glyphs[str(ord(char))] = metrics
+
+    atlas_height = max((bbox[3] - bbox[1] for bbox in bounds if bbox is not None), default=1)
+    atlas = Image.new('RGBA', (max(atlas_x - ATLAS_PADDING, 1), atlas_height), (0, 0, 0, 0))
+    for source, x in placements:
+        atlas.paste(sheet.crop(source), (x, 0))
+
+    table = {
+        "sheet": os.path.basename(sheet_path),
+        "char_order": char_order,
+        "cell_height": img_height,
+        "glyphs": glyphs,
+    }
+
+    # Create output folder if it doesn't exist
+    os.makedirs(output_folder, exist_ok=True)
+    name = atlas_name(sheet_path)
+    png_info = PngInfo()
+    png_info.add_itxt(ATLAS_METRICS_KEY, json.dumps(table, separators=(',', ':')))
+    atlas.save(os.path.join(output_folder, f"{name}.png"), pnginfo=png_info)
+    with open(os.path.join(output_folder, f"{name}.json"), 'w', encoding='utf-8') as f:
+        json.dump(table, f, indent=1)
+
+    if split_glyphs:
+        # the single character images the older renderer and other tools read
+        for char, (left, right) in zip(char_order, columns):
+            sheet.crop((left, 0, right, img_height)).save(os.path.join(output_folder, f"{ord(char)}.png"))
+
+    return (f"{sheet_path}: {num_chars} characters, cells {char_width}x{img_height}{note}, "
+            f"atlas {atlas.width}x{atlas.height} saved as {os.path.join(output_folder, name)}.png")
 
 
 def main():
     parser = argparse.ArgumentParser(
-        description="Splits a grid image of characters into individual character images."
+        description="Packs grid images of characters into glyph atlases with a metrics table."
     )
-    parser.add_argument("input_image", help="Path to the input PNG image.")
     parser.add_argument(
-        "output_folder", help="Folder to save the individual character images."
+        "paths", nargs="+", metavar="input_image [output_folder]",
+        help="Path to the input PNG image(s). A single image can be followed by the folder to save the atlas in (default: the folder of each input image).",
+    )
+    parser.add_argument(
+        "--output-folder", "-o",
+        help="Folder to save the atlas in, the same as the positional output folder.",
+        default=None,
     )
     parser.add_argument(
         "--char_order",
         help="String representing the order of characters in the grid.",
         default=None,
     )
+    parser.add_argument(
+        "--cell-width",
+        type=int,
+        help="Width of one grid cell in pixels (default: image width // number of characters).",
+        default=None,
+    )
+    parser.add_argument(
+        "--split-glyphs",
+        action="store_true",
+        help="Also save every character as its own PNG named after its code point.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes when several images are given (default: number of CPUs).",
+    )
 
     args = parser.parse_args()
+    # "font_splitter.py sheet.png outdir": a last path that is neither a PNG nor another file is the output folder
+    input_images = args.paths
+    output_folder = args.output_folder
+    if len(input_images) > 1 and not input_images[-1].lower().endswith(".png") and not os.path.isfile(input_images[-1]):
+        if output_folder:
+            parser.error(f"the output folder is given twice: '{input_images[-1]}' and --output-folder '{output_folder}'")
+        output_folder = input_images.pop()
+    for sheet_path in input_images:
+        if not sheet_path.lower().endswith(".png"):
+            parser.error(f"not a PNG image: '{sheet_path}'")
+    if output_folder and len(input_images) > 1:
+        parser.error("an output folder can only be used with a single input image")
 
-    # Load the image
-    img = Image.open(args.input_image)
-    img_width, img_height = img.size
-    
     char_order = args.char_order if args.char_order else standard_char_order
-    num_chars = len(char_order)
-    print(f"Number of characters: {num_chars}")
-    
-    char_width = img_width // num_chars
-    char_height = img_height
-    
-    print(f"Image size: {img_width}x{img_height}")
-    print(f"Character size: {char_width}x{char_height}")
-    
-    for index, char in enumerate(char_order):
-        left = index * char_width
-        upper = 0
-        right = left + char_width
-        lower = upper + char_height
-        
-        char_img = img.crop((left, upper, right, lower))
-        
-        # Create output folder if it doesn't exist
-        os.makedirs(args.output_folder, exist_ok=True)
-        
-        # Save the character image
-        char_filename = os.path.join(args.output_folder, f"{ord(char)}.png")
-        char_img.save(char_filename)
-        print(f"Saved character '{char}' as {char_filename}")
+    print(f"Number of characters: {len(char_order)}")
+
+    jobs = [(sheet_path, output_folder or os.path.dirname(os.path.abspath(sheet_path)), char_order, args.cell_width, args.split_glyphs)
+            for sheet_path in input_images]
+
+    failed = False
+    if len(jobs) == 1 or args.workers <= 1:
+        results = []
+        for job in jobs:
+            try:
+                results.append(build_atlas(*job))
+            except (OSError, ValueError) as e:
+                results.append(e)
+    else:
+        # every sheet is independent, so they are split in parallel
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(jobs))) as executor:
+            futures = [executor.submit(build_atlas, *job) for job in jobs]
+            results = []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except (OSError, ValueError) as e:
+                    results.append(e)
+
+    for result in results:
+        if isinstance(result, Exception):
+            print(f"Failed: {result}", file=sys.stderr)
+            failed = True
+        else:
+            print(result)
+
+    if failed:
+        sys.exit(1)
 
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,187 @@
+# Asset optimization for themes
+# Writes an optimized copy of a theme directory, the PNGs referenced from its JSON files are optimized:
+#   dedupe: assets with identical pixels (hashed after decoding, so two encodings of the same image match) are merged,
+#           every reference points at one of them and the copies are removed
+#   masks:  assets that are only ever drawn recolored only need their alpha channel, they are stored as gray+alpha PNGs
+# The JSON files are rewritten as text and only the path strings change, so formatting and key order are kept.
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import time
+
+from PIL import Image
+
+import theme_test
+
+
+# a JSON string literal, including escaped quotes
+JSON_STRING = re.compile(r'"(?:[^"\\]|\\.)*"')
+
+
+# how every PNG of the expanded theme is used: 'recolor' when it is the image of a menu item layer with a palette
+# color (recolor_image only keeps its alpha channel), 'color' for every other use (backgrounds, status bars, ...)
+def collect_asset_usage(data, palette: dict, usage: dict, keys: tuple = ()) -> dict:
+    if isinstance(data, dict):
+        image_path = data.get('image_path')
+        if isinstance(image_path, str) and os.path.isabs(image_path):
+            recolored = len(keys) >= 2 and keys[-1] in ('layers', 'selected_layers') and keys[-2] == 'menu_items' and data.get('recolor_palette') in palette
+            usage.setdefault(image_path, set()).add('recolor' if recolored else 'color')
+        for key, value in data.items():
+            if key == 'image_path':
+                continue
+            if isinstance(value, str):
+                if value.lower().endswith('.png') and os.path.isabs(value):
+                    usage.setdefault(value, set()).add('color')
+            else:
+                collect_asset_usage(value, palette, usage, keys + (key,))
+    elif isinstance(data, list):
+        for value in data:
+            if isinstance(value, str):
+                if value.lower().endswith('.png') and os.path.isabs(value):
+                    usage.setdefault(value, set()).add('color')
+            else:
+                collect_asset_usage(value, palette, usage, keys)
+    return usage
+
+
+# hash of the decoded pixels, the same image saved with other PNG settings gets the same hash
+def pixel_hash(image_path: str) -> str:
+    image = theme_test.open_image(image_path)
+    digest = hashlib.sha256(f"{image.width}x{image.height}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+# the same image with a constant gray channel, opening it as RGBA gives the same alpha
+def alpha_mask(image_path: str) -> Image.Image:
+    alpha = theme_test.open_image(image_path).getchannel('A')
+    return Image.merge('LA', (Image.new('L', alpha.size, 255), alpha))
+
+
+# replace path strings in the JSON text of a theme file, returns the new text and the number of replacements
+def rewrite_json_paths(text: str, theme_path: str, replacements: dict):
+    count = 0
+
+    def replace(match):
+        nonlocal count
+        value = json.loads(match.group(0))
+        candidate = value if os.path.isabs(value) else os.path.normpath(os.path.join(theme_path, value))
+        if candidate not in replacements:
+            return match.group(0)
+        count += 1
+        return json.dumps(replacements[candidate])
+
+    return JSON_STRING.sub(replace, text), count
+
+
+def optimize_theme(theme_path: str, output_path: str, convert_masks: bool = True) -> dict:
+    theme_path = os.path.abspath(theme_path)
+    if not os.path.isdir(theme_path):
+        raise NotADirectoryError(f"Theme directory not found: {theme_path}")
+    if os.path.exists(output_path):
+        raise FileExistsError(f"Output directory already exists: {output_path}")
+
+    theme_data = theme_test.load_theme(theme_path)
+    usage = collect_asset_usage(theme_data, theme_test.palette, {})
+    # menu JSON files are only loaded when the menu is built
+    for lazy in theme_test.create_menus(theme_data, theme_path).values():
+        if isinstance(lazy.menu_path, str):
+            collect_asset_usage(theme_test.menu_json(lazy.menu_path, theme_path), theme_test.palette, usage)
+    # only files inside the theme are optimized
+    assets = sorted(path for path in usage if theme_test.path_kind(path) == 'file' and os.path.commonpath([path, theme_path]) == theme_path)
+
+    groups = {}
+    for image_path in assets:
+        groups.setdefault(pixel_hash(image_path), []).append(image_path)
+
+    # the shortest path of a group is kept, references to the others are rewritten to it
+    replacements = {}
+    duplicates = []
+    canonical_usage = {}
+    for group in groups.values():
+        canonical = min(group, key=lambda path: (len(path), path))
+        canonical_usage[canonical] = set().union(*(usage[path] for path in group))
+        for image_path in group:
+            if image_path != canonical:
+                replacements[image_path] = os.path.relpath(canonical, theme_path).replace(os.sep, '/')
+                duplicates.append(image_path)
+
+    shutil.copytree(theme_path, output_path)
+
+    rewritten_files = 0
+    rewritten_paths = 0
+    if replacements:
+        for dir_path, _, file_names in os.walk(output_path):
+            for file_name in file_names:
+                if not file_name.lower().endswith('.json'):
+                    continue
+                json_file = os.path.join(dir_path, file_name)
+                with open(json_file, 'r', encoding='utf-8') as f:
+                    text = f.read()
+                text, count = rewrite_json_paths(text, theme_path, replacements)
+                if count:
+                    with open(json_file, 'w', encoding='utf-8') as f:
+                        f.write(text)
+                    rewritten_files += 1
+                    rewritten_paths += count
+    for image_path in duplicates:
+        os.remove(os.path.join(output_path, os.path.relpath(image_path, theme_path)))
+
+    masks = 0
+    if convert_masks:
+        for canonical, uses in canonical_usage.items():
+            if uses != {'recolor'}:
+                continue
+            output_file = os.path.join(output_path, os.path.relpath(canonical, theme_path))
+            mask_file = output_file + ".mask"
+            alpha_mask(canonical).save(mask_file, format='PNG', optimize=True)
+            if os.path.getsize(mask_file) < os.path.getsize(output_file):
+                os.replace(mask_file, output_file)
+                masks += 1
+            else:
+                os.remove(mask_file)  # the original is already smaller
+
+    return {
+        "referenced_assets": len(assets),
+        "unique_assets": len(groups),
+        "duplicates_removed": len(duplicates),
+        "masks_converted": masks,
+        "json_files_rewritten": rewritten_files,
+        "paths_rewritten": rewritten_paths,
+        "bytes_before": sum(os.path.getsize(path) for path in assets),
+        "bytes_after": sum(os.path.getsize(os.path.join(output_path, os.path.relpath(path, theme_path))) for path in canonical_usage),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write an optimized copy of a theme with deduplicated assets and alpha-only masks")
+    parser.add_argument("theme", help="Theme directory (with theme.json)")
+    parser.add_argument("output", help="Directory for the optimized theme, must not exist yet")
+    parser.add_argument("--no-masks", action="store_true", help="Keep the colors of assets that are only drawn recolored")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Show the log output of the theme loader")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+    theme_test.logger.setLevel(logging.INFO if args.verbose else logging.ERROR)
+
+    start = time.perf_counter()
+    try:
+        result = optimize_theme(args.theme, args.output, convert_masks=not args.no_masks)
+    except (OSError, ValueError) as e:
+        print(f"Failed to optimize theme: {e}", file=sys.stderr)
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+
+    print(f"{result['referenced_assets']} referenced assets, {result['unique_assets']} unique: "
+          f"{result['duplicates_removed']} duplicates removed, {result['masks_converted']} stored as alpha masks")
+    print(f"{result['paths_rewritten']} paths rewritten in {result['json_files_rewritten']} JSON files")
+    print(f"Assets: {result['bytes_before']} -> {result['bytes_after']} bytes, optimized theme written to '{args.output}' in {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
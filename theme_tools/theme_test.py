@@ -1,12 +1,25 @@
 import json
+import marshal
+import math
+import mmap
 import os
 import re
 import select
+import struct
+import sys
+import tempfile
+from collections import OrderedDict, deque
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from tkinter import *
 import argparse
+import atexit
+import functools
 import logging
+from contextlib import contextmanager
 from pprint import pprint
-from PIL import Image, ImageDraw, ImageTk
+from PIL import Image, ImageChops, ImageDraw, ImageFont, ImageOps, ImageTk
 import pyglet
 
 
@@ -18,6 +31,53 @@ VOLUME = "medium"
 BRIGHTNESS = "100"
 VIBRATE = "on"
 
+FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts", "pager_custom")
+
+# index of the files of the loaded theme, see theme_file_index
+theme_index = None
+# compiled bundle the theme was loaded from, if any (see compiled_theme_bundle)
+theme_bundle = None
+
+# expanded JSON files by (path, base path) with the mtimes of everything they include and the kinds of the paths their
+# values were resolved against, kept across theme reloads
+json_include_cache = {}
+# JSON files that are currently being expanded, the files each of them included and the paths it resolved, used by
+# load_json_include
+# per thread, menus are also built (and their JSON expanded) by the warm-up and prefetch threads
+include_state = threading.local()
+
+# offscreen frame everything is drawn into and the single PhotoImage it is shown with on the canvas
+framebuffer = Image.new('RGBA', (PAGER_SCREEN_WIDTH, PAGER_SCREEN_HEIGHT), (0, 0, 0, 255))
+screen_photo_image = None
+# integer factor the framebuffer is shown at in the window, frames are still drawn at the pager resolution
+preview_scale = 1
+ui_fonts = {}
+
+# bookkeeping of the last full frame for incremental redraws: the frame before the items were drawn, the region
+# each menu item and the status bar covers, the region covered by blit_image calls and which screen it shows
+background_frame = None
+item_regions = []
+status_bar_region = None
+drawn_region = None
+frame_key = None
+
+# canvas and pager buttons of the GUI, they stay None when rendering headless
+canvas_screen = None
+a_button = b_button = up_button = down_button = left_button = right_button = None
+status_menu_variables = []
+
+# memory budget of the decoded layer image cache, see image_cache
+DEFAULT_SCREEN_BUDGET_BYTES = 2 * 1024 * 1024
+DEFAULT_IMAGE_CACHE_BYTES = 64 * 1024 * 1024
+
+# glyphs of the pager_custom fonts per font size, filled on first use
+glyph_atlases = {}
+target_index = {}
+target_index_menus = None
+
+# lookup table that turns an alpha channel into a mask of all non-transparent pixels (used by recolor_image)
+OPAQUE_MASK_TABLE = [0] + [255] * 255
+
 # TODO: add buttons for: navigation, reloading theme, exiting tool, toggling debug output
 # TODO: add gui for selecting theme path if not provided as argument
 
@@ -26,10 +86,70 @@ VIBRATE = "on"
 # Set up logging
 logger = logging.getLogger("theme_test")
 
-def main():
-    global menu_target, selected_menu_item, selected_page, button_map, canvas_screen, menu, menu_items, pages, palette, a_button, b_button, up_button, down_button, left_button, right_button, menus, menu_path, status_bars, menu
+# Tracing
+# Records timing spans of the load and render phases and counts file opens, PNG decodes and canvas items per frame.
+# The result is written as Chrome trace JSON that can be opened in chrome://tracing or https://ui.perfetto.dev
+class frame_tracer:
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self.counters = {}
+    
+    def enable(self):
+        self.enabled = True
+    
+    # perf_counter is system wide, so events of the export worker processes line up with the main process
+    def timestamp(self) -> float:
+        return time.perf_counter() * 1e6  # Chrome traces use microseconds
+    
+    @contextmanager
+    def span(self, name: str, **args):
+        if not self.enabled:
+            yield
+            return
+        start = self.timestamp()
+        try:
+            yield
+        finally:
+            self.events.append({'name': name, 'ph': 'X', 'ts': start, 'dur': self.timestamp() - start, 'pid': os.getpid(), 'tid': threading.get_ident(), 'args': args})
     
-    pyglet.font.add_file("theme_tools/fonts/DejaVuSans.ttf")
+    def count(self, name: str, amount: int = 1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+    
+    # close the current frame: its counters become one counter event and start again at zero
+    def frame_done(self):
+        if not self.enabled:
+            return
+        frame_counters = {name: self.counters.get(name, 0) for name in ("file opens", "png decodes", "canvas items")}
+        self.events.append({'name': "frame", 'ph': 'C', 'ts': self.timestamp(), 'pid': os.getpid(), 'tid': threading.get_ident(), 'args': frame_counters})
+        self.counters = {}
+    
+    # hand over the recorded events, e.g. from a worker process to the main process
+    def drain(self) -> list:
+        events, self.events = self.events, []
+        return events
+    
+    def write(self, trace_path: str):
+        self.frame_done()
+        with open(trace_path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f)
+        logger.info(f"Wrote {len(self.events)} trace events to {trace_path}")
+
+tracer = frame_tracer()
+
+# decorator that records every call of the function as a span when tracing is enabled
+def traced(function):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not tracer.enabled:
+            return function(*args, **kwargs)
+        with tracer.span(function.__name__):
+            return function(*args, **kwargs)
+    return wrapper
+
+def main():
+    global menu_target, selected_menu_item, selected_page, button_map, canvas_screen, menu, menu_items, pages, palette, a_button, b_button, up_button, down_button, left_button, right_button, menus, menu_path, status_bars, menu, prefetcher, preview_scale
     
     menu_target = "dashboard_path"
     menu_path = [menu_target]
@@ -37,7 +157,7 @@ def main():
     parser = argparse.ArgumentParser(description="Test Theme Tool")
     
     # Argument that need to be provided
-    parser.add_argument("--theme", type=str, required=True, help="Location of the base directory of the theme to test")
+    parser.add_argument("--theme", type=str, required=True, help="Location of the base directory of the theme to test, or of a theme bundle made with --compile")
     
     # Argument that can be provided but have defaults
     parser.add_argument("--menu-target", "-i", type=str, default=menu_target, help="Target of the menu to load initially (default: dashboard_path)")
@@ -46,8 +166,39 @@ def main():
     parser.add_argument("--verbose", "-v", action="store_true", help="Enable verbose output for debugging")
     parser.add_argument("--debug", "-d", action="store_true", help="Enable debug mode")
     
+    parser.add_argument("--warm-menus", action="store_true", help="Build all menus on a background thread after the first frame instead of on first use")
+    
+    parser.add_argument("--trace", type=str, default=None, metavar="FILE", help="Write a Chrome trace / Perfetto JSON file with timing spans and per-frame counters on exit")
+    
+    parser.add_argument("--image-cache-bytes", type=int, default=DEFAULT_IMAGE_CACHE_BYTES, help=f"Memory budget in bytes of the decoded image cache (default: {DEFAULT_IMAGE_CACHE_BYTES})")
+    
+    parser.add_argument("--prefetch-depth", type=int, default=1, help="Number of button presses ahead whose screens are decoded in the background, 0 disables prefetching (default: 1)")
+    parser.add_argument("--watch", action="store_true", help="Reload the theme and redraw the current screen when files of the theme change")
+    parser.add_argument("--watch-interval", type=float, default=0.25, help="Seconds between two checks of the theme files with --watch (default: 0.25)")
+    parser.add_argument("--watch-debounce", type=float, default=0.3, help="Seconds without further changes before --watch reloads, so a burst of saves reloads once (default: 0.3)")
+    parser.add_argument("--record", type=str, default=None, metavar="FILE", help="Write the buttons pressed in the GUI to FILE on exit, for --replay")
+    parser.add_argument("--prefetch-workers", type=int, default=2, help="Number of threads used for prefetching (default: 2)")
+    parser.add_argument("--scale", type=int, default=1, metavar="N", help="Show the screen N times larger with sharp (nearest neighbour) pixels, frames are still drawn at the pager resolution (default: 1)")
+    
+    # Headless arguments
+    parser.add_argument("--compile", type=str, default=None, metavar="BUNDLE", help="Compile the theme into a bundle file that --theme can load without parsing JSON or decoding PNGs")
+    parser.add_argument("--export", type=str, default=None, metavar="DIR", help="Render every menu, page and selected item to PNG files in DIR without opening a window")
+    parser.add_argument("--compare", type=str, default=None, metavar="GOLDEN_DIR", help="Render every screen like --export and compare it with the golden PNGs in GOLDEN_DIR (e.g. an earlier --export), exits with 1 on differences")
+    parser.add_argument("--tolerance", type=int, default=0, help="Largest difference of a color channel (0-255) that still counts as equal with --compare (default: 0)")
+    parser.add_argument("--diff-dir", type=str, default=None, help="Write a diff heatmap for every screen that differs with --compare to this directory")
+    parser.add_argument("--memory-report", type=str, default=None, metavar="FILE", help="Write the decoded image bytes and draw operations of every screen as JSON to FILE without rendering, exits with 1 if a screen is over budget")
+    parser.add_argument("--budget-bytes", type=int, default=DEFAULT_SCREEN_BUDGET_BYTES, help=f"Decoded bytes a screen may use with --memory-report (default: {DEFAULT_SCREEN_BUDGET_BYTES})")
+    parser.add_argument("--budget-ops", type=int, default=0, help="Draw operations a screen may use with --memory-report, 0 for no limit (default: 0)")
+    parser.add_argument("--replay", type=str, default=None, metavar="FILE", help="Replay the buttons of a --record file through use_button_map without opening a window and report the latency per menu")
+    parser.add_argument("--replay-rounds", type=int, default=1, help="Number of times the recording is replayed with --replay (default: 1)")
+    parser.add_argument("--replay-report", type=str, default=None, metavar="FILE", help="Write the per step timings and percentiles of --replay as JSON to FILE")
+    parser.add_argument("--explore", type=str, default=None, metavar="FILE", help="Explore every menu/page/item state reachable from --menu-target through the button maps and write dead targets, unreachable menus and state depths as JSON to FILE")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes for headless rendering (default: number of CPUs)")
+    
     
     args = parser.parse_args()
+    if args.scale < 1:
+        parser.error("--scale must be 1 or larger")
     
     menu_target = args.menu_target
     if menu_target not in menu_path:
@@ -72,11 +223,75 @@ def main():
     
     logger.info(f"Testing theme located at: {args.theme}")
     
+    layer_image_cache.budget_bytes = args.image_cache_bytes
+    
+    if args.trace:
+        tracer.enable()
+        atexit.register(tracer.write, args.trace)
+    
+    if args.compile:
+        try:
+            compile_theme(args.theme, args.compile)
+        except Exception as e:
+            logger.error(f"Failed to compile theme: {e}")
+        return
+    
+    if args.export:
+        try:
+            exported, total = export_theme(args.theme, args.export, args.workers)
+        except Exception as e:
+            logger.error(f"Failed to export theme: {e}")
+            sys.exit(2)
+        # screens that failed to render are logged by the workers, CI still has to see them
+        sys.exit(1 if exported < total else 0)
+    
+    if args.memory_report:
+        try:
+            over_budget = memory_report(args.theme, args.memory_report, args.budget_bytes, args.budget_ops)
+        except Exception as e:
+            logger.error(f"Failed to write memory report: {e}")
+            sys.exit(2)
+        sys.exit(1 if over_budget else 0)
+    
+    if args.replay:
+        try:
+            replay_buttons(args.theme, args.replay, args.replay_report, max(1, args.replay_rounds))
+        except Exception as e:
+            logger.error(f"Failed to replay buttons: {e}")
+            sys.exit(2)
+        return
+    
+    if args.explore:
+        try:
+            problems = explore_theme(args.theme, args.menu_target, args.explore)
+        except Exception as e:
+            logger.error(f"Failed to explore theme: {e}")
+            sys.exit(2)
+        sys.exit(1 if problems else 0)
+    
+    if args.compare:
+        try:
+            failed = compare_theme(args.theme, args.compare, args.diff_dir, args.tolerance, args.workers)
+        except Exception as e:
+            logger.error(f"Failed to compare theme: {e}")
+            sys.exit(2)
+        sys.exit(1 if failed else 0)
+    
+    pyglet.font.add_file("theme_tools/fonts/DejaVuSans.ttf")
+    
+    if args.prefetch_depth > 0:
+        prefetcher = menu_prefetcher(args.prefetch_depth, max(1, args.prefetch_workers))
+    
+    if args.record:
+        start_recording(args.record)
+    
     # Initialize Tkinter root
     logger.debug("Initializing Tkinter root window")
     root = Tk()
     root.title("Theme Test Tool")
-    root.geometry(f"{PAGER_SCREEN_WIDTH}x{PAGER_SCREEN_HEIGHT+85}")  # Extra space for buttons below the screen
+    preview_scale = args.scale
+    screen_width, screen_height = PAGER_SCREEN_WIDTH * preview_scale, PAGER_SCREEN_HEIGHT * preview_scale
+    root.geometry(f"{screen_width}x{screen_height+85}")  # Extra space for buttons below the screen
     
     # Bind Ctrl+C to exit
     def on_ctrl_c(event):
@@ -85,9 +300,9 @@ def main():
     
     root.bind('<Control-c>', on_ctrl_c)
     
-    canvas_screen = Canvas(root, width=PAGER_SCREEN_WIDTH, height=PAGER_SCREEN_HEIGHT, bg="black")
+    canvas_screen = Canvas(root, width=screen_width, height=screen_height, bg="black")
     canvas_screen.pack()
-    canvas_screen.create_rectangle(0, 0, PAGER_SCREEN_WIDTH, PAGER_SCREEN_HEIGHT, fill="blue")
+    canvas_screen.create_rectangle(0, 0, screen_width, screen_height, fill="blue")
     
     
     # Pager navigation buttons
@@ -98,39 +313,45 @@ def main():
     left_button = Button(root, text="Left")     # Left
     right_button = Button(root, text="Right")   # Right
     
-    b_button.place(x=50, y=32.5+PAGER_SCREEN_HEIGHT, width=50, height=20)
-    a_button.place(x=110, y=32.5+PAGER_SCREEN_HEIGHT, width=50, height=20)
+    b_button.place(x=50, y=32.5+screen_height, width=50, height=20)
+    a_button.place(x=110, y=32.5+screen_height, width=50, height=20)
     
-    left_button.place(x=210, y=20+PAGER_SCREEN_HEIGHT, width=50, height=45)
-    up_button.place(x=265, y=20+PAGER_SCREEN_HEIGHT, width=50, height=20)
-    right_button.place(x=320, y=20+PAGER_SCREEN_HEIGHT, width=50, height=45)
-    down_button.place(x=265, y=45+PAGER_SCREEN_HEIGHT, width=50, height=20)
+    left_button.place(x=210, y=20+screen_height, width=50, height=45)
+    up_button.place(x=265, y=20+screen_height, width=50, height=20)
+    right_button.place(x=320, y=20+screen_height, width=50, height=45)
+    down_button.place(x=265, y=45+screen_height, width=50, height=20)
     
     
     # functions for buttons
     def on_a_button():
         logger.info("A button pressed. \t It is mapped to: " + button_map['a'])
+        record_button('a')
         use_button_map('a')
     
     def on_b_button():
         logger.info("B button pressed. \t It is mapped to: " + button_map['b'])
+        record_button('b')
         use_button_map('b')
 
     
     def on_up_button():
         logger.info("Up button pressed. \t It is mapped to: " + button_map['up'])
+        record_button('up')
         use_button_map('up')
     
     def on_down_button():
         logger.info("Down button pressed. \t It is mapped to: " + button_map['down'])
+        record_button('down')
         use_button_map('down')
     
     def on_left_button():
         logger.info("Left button pressed. \t It is mapped to: " + button_map['left'])
+        record_button('left')
         use_button_map('left')
     
     def on_right_button():
         logger.info("Right button pressed. \t It is mapped to: " + button_map['right'])
+        record_button('right')
         use_button_map('right')
     
     # assign functions to buttons
@@ -143,20 +364,10 @@ def main():
 
     # reload button
     reload_button = Button(root, text="Reload Theme")
-    reload_button.place(x=400, y=32.5+PAGER_SCREEN_HEIGHT, width=75, height=20)
+    reload_button.place(x=400, y=32.5+screen_height, width=75, height=20)
     def on_reload():
         logger.info("Reloading theme...")
-        try:
-            theme_data = load_theme(args.theme)
-            menus = create_menus(theme_data, args.theme)
-            status_bars = create_status_bars(theme_data, args.theme)
-            if menus:
-                load_menu()
-                logger.info("Theme reloaded and menu rendered.")
-            else:
-                logger.warning("No menus found in theme data after reload.")
-        except Exception as e:
-            logger.error(f"Failed to reload theme: {e}")
+        reload_theme(args.theme)
     reload_button.config(command=on_reload)
     
 
@@ -180,93 +391,402 @@ def main():
     logger.info(f"Created menus: {list(menus.keys())}")
     
     if menus:
-        if menu_target in list(menus.keys()):
-            logger.info(f"Loading menu {menus[menu_target].menu_data['screen_name']}")
-            menu = menus[menu_target]
-        elif f'{menu_target}_path' in list(menus.keys()):
-            menu_target = menu_target + '_path'
+        menu_key = resolve_menu_target(menu_target)
+        if menu_key is not None:
+            menu_target = menu_key
             menu = menus[menu_target]
-            logger.info(f"Loading menu {menus[menu_target].menu_data['screen_name']}")
+            logger.info(f"Loading menu {menus[menu_target].model.screen_name}")
         else:
             logger.error(f"Couldn't find menu target '{menu_target}' in menus.")
             logger.error(f"Available menus: {list(menus.keys())}")
             return
             
         load_menu()
+        build_status_menu(root)
+        if args.warm_menus:
+            warm_up_menus(menus, status_bars)
+        if args.watch:
+            theme_watcher(root, args.theme, args.watch_interval, args.watch_debounce).start()
     else:
         logger.warning("No menus found in theme data to render")
     
     logger.info("Starting the Theme Test Tool GUI")
     root.mainloop()
+    if prefetcher is not None:
+        prefetcher.shutdown()
     logger.info("Exiting the Theme Test Tool")
     
 
+@traced
 def load_theme(theme_path):
-    global palette
+    global palette, theme_index, theme_bundle
+    # a compiled theme bundle is mapped into memory instead of parsing and expanding the JSON files
+    if os.path.isfile(theme_path):
+        theme_bundle = compiled_theme_bundle(theme_path)
+        theme_index = theme_bundle.index
+        palette = theme_bundle.palette
+        logger.debug(f"Loaded color palette: {palette}")
+        return theme_bundle.theme_data
+    theme_bundle = None
+    
     # first get the theme.json file form the root of the theme path
     theme_file = os.path.join(theme_path, "theme.json")
     # check if the file exists
     if not os.path.isfile(theme_file):
         raise FileNotFoundError(f"Theme file not found: {theme_file}")
+    # scan the theme directory once, all path lookups while expanding and rendering are answered from this index
+    theme_index = theme_file_index(theme_path)
     # load the theme file and convert it to a dictionary
-    import json
-    with open(theme_file, 'r', encoding='utf-8') as f:
-        theme_data_raw = json.load(f)
-    
-    # Expand paths relative to the theme root so values like "assets/..." work
-    theme_data = expand_dict(theme_data_raw, base_path=theme_path)
+    # Expand paths relative to the theme root so values like "assets/..." work, against the absolute theme path so
+    # every resolved path is absolute and the menus don't need to resolve them again
+    # (unchanged files are taken from the include cache, e.g. when reloading the theme)
+    theme_data = load_json_include(theme_file, base_path=os.path.abspath(theme_path), menu_depth=2)
     '''if logger.isEnabledFor(logging.DEBUG):
         logger.debug("Expanded theme data:")
         pprint(theme_data)'''
     
-    palette = theme_data.get('color_palette', {})
+    # a copy, the palette JSON is shared through the include cache and must stay read-only
+    palette = dict(theme_data.get('color_palette', {}))
     white_strength = 0.8
     palette["white"] = {'r': int(255*white_strength), 'g': int(255*white_strength), 'b': int(255*white_strength)}
     logger.debug(f"Loaded color palette: {palette}")
     
     return theme_data
 
+# index of every file and directory below the theme directory, scanned once so resolving a value
+# never needs a syscall (strings like "select" or titles are answered with a dictionary lookup)
+class theme_file_index:
+    def __init__(self, theme_path, entries=None, mtimes=None):
+        # relative lookups are resolved against the working directory at scan time
+        self.cwd = os.getcwd()
+        self.root = self.absolute(theme_path)
+        self.root_prefix = os.path.normcase(os.path.join(self.root, ''))
+        if entries is not None:
+            # restored from a compiled theme bundle, no scanning
+            self.entries = entries
+            self.mtimes = mtimes
+            return
+        self.entries = {os.path.normcase(self.root): 'dir'}
+        self.mtimes = {}
+        visited = set()
+        pending = [self.root]
+        while pending:
+            directory = pending.pop()
+            real_directory = os.path.realpath(directory)
+            if real_directory in visited:
+                continue  # symlink loop
+            visited.add(real_directory)
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir():
+                            self.entries[os.path.normcase(entry.path)] = 'dir'
+                            pending.append(entry.path)
+                        elif entry.is_file():
+                            self.entries[os.path.normcase(entry.path)] = 'file'
+                            self.mtimes[os.path.normcase(entry.path)] = entry.stat().st_mtime_ns
+            except OSError as e:
+                logger.warning(f"Couldn't scan theme directory {directory}: {e}")
+        logger.debug(f"Indexed {len(self.entries)} files and directories below {self.root}")
+    
+    def absolute(self, path: str) -> str:
+        return os.path.normpath(path if os.path.isabs(path) else os.path.join(self.cwd, path))
+    
+    # 'file', 'dir' or None if the path doesn't exist
+    def kind(self, path: str):
+        path = self.absolute(path)
+        key = os.path.normcase(path)
+        if key in self.entries:
+            return self.entries[key]
+        if key.startswith(self.root_prefix):
+            return None  # inside the theme but not indexed, so it doesn't exist
+        # outside of the theme directory, ask the file system
+        if os.path.isfile(path):
+            return 'file'
+        if os.path.isdir(path):
+            return 'dir'
+        return None
+    
+    # modification time in ns of a file, None if it doesn't exist
+    def mtime(self, path: str):
+        path = self.absolute(path)
+        key = os.path.normcase(path)
+        if key in self.mtimes:
+            return self.mtimes[key]
+        if key.startswith(self.root_prefix):
+            return None
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+# look up if a path is a file or directory, using the index of the loaded theme when there is one
+def path_kind(path: str):
+    if theme_index is not None:
+        return theme_index.kind(path)
+    if os.path.isfile(path):
+        return 'file'
+    if os.path.isdir(path):
+        return 'dir'
+    return None
+
+# Compiled theme bundles
+# A bundle is one file holding the fully expanded theme tree, the normalized menus and status bars, the theme file
+# index and the decoded RGBA pixels of every referenced image and of all glyphs. Loading maps the file with mmap
+# and creates images directly on top of the mapping, so there is no JSON parsing, path probing or PNG decoding.
+# Layout: header (magic, format version, marshal version, metadata offset and length), pixel data, metadata.
+# The metadata is written with marshal, so a bundle only loads with the Python version that compiled it and
+# should only be loaded from trusted sources, like any other build artefact.
+BUNDLE_MAGIC = b"PAGERTB\0"
+BUNDLE_VERSION = 1
+BUNDLE_HEADER = struct.Struct("<8sHHQQ")
+BUNDLE_ALIGNMENT = 16
+
+class compiled_theme_bundle:
+    def __init__(self, bundle_path):
+        self.bundle_path = bundle_path
+        with open(bundle_path, 'rb') as f:
+            self.mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, marshal_version, meta_offset, meta_length = BUNDLE_HEADER.unpack_from(self.mapping, 0)
+        if magic != BUNDLE_MAGIC:
+            raise ValueError(f"Not a compiled theme bundle: {bundle_path}")
+        if version != BUNDLE_VERSION or marshal_version != marshal.version:
+            raise ValueError(f"Theme bundle {bundle_path} was compiled by another version, compile it again")
+        meta = marshal.loads(self.mapping[meta_offset:meta_offset + meta_length])
+        self.pixels = memoryview(self.mapping)
+        self.theme_path = meta['theme_path']
+        self.theme_data = meta['theme_data']
+        self.menus = meta['menus']
+        self.status_bars = meta['status_bars']
+        self.palette = meta['palette']
+        self.images = meta['images']
+        self.glyphs = meta['glyphs']
+        self.index = theme_file_index(self.theme_path, meta['index_entries'], meta['index_mtimes'])
+        logger.info(f"Mapped theme bundle {bundle_path}: {len(self.menus)} menus, {len(self.images)} images")
+    
+    # read-only image backed by the mapping, None if the bundle doesn't contain the image
+    def image(self, image_path: str):
+        entry = self.images.get(os.path.normcase(self.index.absolute(image_path)))
+        if entry is None:
+            return None
+        return self.image_from_entry(entry)
+    
+    def image_from_entry(self, entry) -> Image.Image:
+        offset, width, height = entry
+        return Image.frombuffer('RGBA', (width, height), self.pixels[offset:offset + width * height * 4], 'raw', 'RGBA', 0, 1)
+    
+    # glyph atlas of one font size in the same format as load_glyph_atlas
+    def glyph_atlas(self, font_size: str):
+        if font_size not in self.glyphs:
+            return None
+        return {char: self.image_from_entry(entry) for char, entry in self.glyphs[font_size].items()}
+
+# every string value in a nested structure of dicts and lists
+def iter_strings(data):
+    if isinstance(data, str):
+        yield data
+    elif isinstance(data, dict):
+        for value in data.values():
+            yield from iter_strings(value)
+    elif isinstance(data, list):
+        for value in data:
+            yield from iter_strings(value)
+
+# compile a theme directory into one bundle file that load_theme can map into memory
+def compile_theme(theme_path: str, bundle_path: str):
+    global glyph_atlases
+    start = time.perf_counter()
+    # absolute paths, so the bundle works from any working directory
+    theme_path = os.path.abspath(theme_path)
+    theme_data = load_theme(theme_path)
+    compiled_menus = {key: lazy.loaded_data for key, lazy in create_menus(theme_data, theme_path).items()}
+    compiled_status_bars = {key: lazy.loaded_data for key, lazy in create_status_bars(theme_data, theme_path).items()}
+    
+    image_extensions = Image.registered_extensions()
+    image_paths = set()
+    for value in iter_strings([theme_data, compiled_menus, compiled_status_bars]):
+        if os.path.splitext(value)[1].lower() in image_extensions and path_kind(value) == 'file':
+            image_paths.add(value)
+    
+    images = {}
+    glyphs = {}
+    # written to a temporary file next to the bundle and moved over it at the end, a previewer that has the old bundle
+    # mapped keeps reading the old file instead of a truncated one (which would crash it with SIGBUS)
+    bundle_directory = os.path.dirname(os.path.abspath(bundle_path))
+    fd, temporary_path = tempfile.mkstemp(prefix=os.path.basename(bundle_path) + ".", suffix=".tmp", dir=bundle_directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, marshal.version, 0, 0))
+            
+            def write_pixels(image: Image.Image):
+                padding = -f.tell() % BUNDLE_ALIGNMENT
+                f.write(b"\0" * padding)
+                offset = f.tell()
+                f.write(image.tobytes())
+                return (offset, image.width, image.height)
+            
+            for image_path in sorted(image_paths):
+                try:
+                    images[os.path.normcase(theme_index.absolute(image_path))] = write_pixels(open_image(image_path))
+                except OSError as e:
+                    logger.warning(f"Couldn't decode image for the bundle: {image_path}: {e}")
+            for font_size in ("small", "medium", "large"):
+                glyphs[font_size] = {char: write_pixels(glyph) for char, glyph in load_glyph_atlas(font_size).items()}
+            
+            meta = marshal.dumps({
+                'theme_path': theme_path,
+                'theme_data': theme_data,
+                'menus': compiled_menus,
+                'status_bars': compiled_status_bars,
+                'palette': palette,
+                'images': images,
+                'glyphs': glyphs,
+                'index_entries': theme_index.entries,
+                'index_mtimes': theme_index.mtimes,
+            })
+            meta_offset = f.tell()
+            f.write(meta)
+            f.seek(0)
+            f.write(BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, marshal.version, meta_offset, len(meta)))
+            bundle_size = meta_offset + len(meta)
+        # mkstemp creates the file readable by the owner only, give it the permissions open() would have
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temporary_path, 0o666 & ~umask)
+        os.replace(temporary_path, bundle_path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+    
+    print(f"Compiled {len(compiled_menus)} menus, {len(compiled_status_bars)} status bars and {len(images)} images into '{bundle_path}' ({bundle_size / 1024:.0f} KiB) in {time.perf_counter() - start:.2f} s")
+
+# (include_chain, include_dependencies, include_probes) of the current thread
+def include_stacks():
+    if not hasattr(include_state, 'chain'):
+        include_state.chain = []
+        include_state.dependencies = []
+        include_state.probes = []
+    return include_state.chain, include_state.dependencies, include_state.probes
+
+# load a JSON file of the theme and expand it, every file is read and expanded only once as long as it and
+# everything it includes is unchanged. The result is shared between all keys that reference the file, so it
+# must be treated as read-only. Includes that (indirectly) include themselves raise a ValueError with the chain.
+# menu_depth is the number of levels of the file in which menu JSON files are kept as paths (see expand_dict).
+def load_json_include(json_path: str, base_path: str, menu_depth: int = 0):
+    global json_include_cache
+    include_chain, include_dependencies, include_probes = include_stacks()
+    cache_key = (os.path.normcase(os.path.abspath(json_path)), os.path.normcase(os.path.abspath(base_path)), menu_depth)
+    
+    if cache_key in include_chain:
+        chain = include_chain[include_chain.index(cache_key):] + [cache_key]
+        chain = " -> ".join(os.path.relpath(path, cache_key[1]) for path, _, _ in chain)
+        raise ValueError(f"Include cycle detected: {chain}")
+    
+    # only files that are added or removed where a value of the file points change its expansion, other files don't
+    cached = json_include_cache.get(cache_key)
+    if cached is not None:
+        data, dependencies, probes = cached
+        if all(path_mtime(path) == mtime for path, mtime in dependencies.items()) and all(path_kind(path) == kind for path, kind in probes.items()):
+            logger.debug(f"Using cached JSON include: {json_path}")
+            if include_dependencies:
+                include_dependencies[-1].update(dependencies)
+                include_probes[-1].update(probes)
+            return data
+    
+    include_chain.append(cache_key)
+    include_dependencies.append({cache_key[0]: path_mtime(json_path)})
+    include_probes.append({})
+    try:
+        tracer.count("file opens")
+        with open(json_path, 'r', encoding='utf-8') as f:
+            loaded = json.load(f)
+        with tracer.span("expand_dict", file=json_path):
+            if isinstance(loaded, dict):
+                data = expand_dict(loaded, base_path, menu_depth)
+            elif isinstance(loaded, list):
+                data = enter_lists(loaded, base_path)
+            else:
+                data = loaded
+    finally:
+        include_chain.pop()
+        dependencies = include_dependencies.pop()
+        probes = include_probes.pop()
+    
+    json_include_cache[cache_key] = (data, dependencies, probes)
+    if include_dependencies:
+        include_dependencies[-1].update(dependencies)
+        include_probes[-1].update(probes)
+    return data
+
+# path_kind of a path a JSON value is resolved against, remembered for the JSON file that is being expanded
+def probe_path_kind(path: str):
+    kind = path_kind(path)
+    include_probes = include_stacks()[2]
+    if include_probes:
+        include_probes[-1][path] = kind
+    return kind
+
+# modification time of a file, from the index of the loaded theme when there is one
+def path_mtime(path: str):
+    if theme_index is not None:
+        return theme_index.mtime(path)
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
 # Expand dictionaries recursively
-def expand_dict(d: dict, base_path: str):
+def expand_dict(d: dict, base_path: str, menu_depth: int = 0):
     """Recursively expand dict values that point to files/dirs relative to base_path."""
-    logger.debug(f"Expanding dictionary: {d}")
+    # in the top menu_depth levels (the keys of theme.json and the groups below them, where create_menus looks for
+    # menus) a JSON file under a '_path' key is a menu and is kept as a path, it is loaded when the menu is built
+    # this runs for every key of the theme, so the debug messages are only built when they are shown
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        logger.debug("Expanding dictionary: %s", d)
     for key, value in d.items():
-        logger.debug(f"Processing key: {key}, value: {value}")
+        if debug:
+            logger.debug("Processing key: %s, value: %s", key, value)
 
         # Try to resolve strings as paths relative to the theme root
         if isinstance(value, str):
             candidate = value if os.path.isabs(value) else os.path.normpath(os.path.join(base_path, value))
 
-            logger.debug(f"Resolved candidate path for key '{key}': {candidate}")
+            if debug:
+                logger.debug("Resolved candidate path for key '%s': %s", key, candidate)
             
-            if os.path.isfile(candidate):
-                logger.debug(f"Resolved file for key '{key}': {candidate}")
-                if candidate.endswith('.json'):
-                    logger.debug(f"Loading JSON file for key '{key}': {candidate}")
-                    with open(candidate, 'r', encoding='utf-8') as f:
-                        loaded = json.load(f)
-                    d[key] = expand_dict(loaded, base_path)
+            candidate_kind = probe_path_kind(candidate)
+            if candidate_kind == 'file':
+                if menu_depth > 0 and candidate.endswith('.json') and key.endswith('_path'):
+                    # a menu JSON is only loaded and expanded when the menu is built, see menu_json
+                    if debug:
+                        logger.debug("Deferring menu JSON file for key '%s': %s", key, candidate)
+                    d[key] = candidate
+                elif candidate.endswith('.json'):
+                    if debug:
+                        logger.debug("Loading JSON file for key '%s': %s", key, candidate)
+                    d[key] = load_json_include(candidate, base_path)
                 else:
-                    logger.debug(f"Assigning file path for key '{key}': {candidate}")
+                    if debug:
+                        logger.debug("Assigning file path for key '%s': %s", key, candidate)
                     d[key] = candidate
                 continue
             
-            if os.path.isdir(candidate):
-                logger.debug(f"Resolved directory for key '{key}': {candidate}")
+            if candidate_kind == 'dir':
+                if debug:
+                    logger.debug("Resolved directory for key '%s': %s", key, candidate)
                 d[key] = candidate
                 continue
             
-            logger.debug(f"No file or directory found for key '{key}', keeping original value")
+            if debug:
+                logger.debug("No file or directory found for key '%s', keeping original value", key)
 
         if isinstance(value, dict):
-            logger.debug(f"Expanding dictionary for key: {key}")
-            d[key] = expand_dict(value, base_path)
+            d[key] = expand_dict(value, base_path, menu_depth - 1)
         elif isinstance(value, list):
-            logger.debug(f"\u001b[41mEntering list for key: {key}\u001b[0m")
+            if debug:
+                logger.debug("\u001b[41mEntering list for key: %s\u001b[0m", key)
             d[key] = enter_lists(value, base_path)
-        else:
-            logger.debug(f"Did nothing for key: {key}, value: {value}")
-            d[key] = d[key]
     return d
 
 # Enter Lists in dictionaries
@@ -279,9 +799,7 @@ def enter_lists(d: list, base_path: str):
             d[i] = enter_lists(value, base_path)
         elif isinstance(value, str):
             candidate = value if os.path.isabs(value) else os.path.normpath(os.path.join(base_path, value))
-            if os.path.isfile(candidate):
-                d[i] = candidate
-            elif os.path.isdir(candidate):
+            if probe_path_kind(candidate) is not None:
                 d[i] = candidate
             else:
                 d[i] = value
@@ -290,49 +808,475 @@ def enter_lists(d: list, base_path: str):
 
     return d
 
-# Renders the menu on the screen in the frame
-def render_menu(menu_data):
-    global canvas_screen,selected_page, menu_items, pages
-    logger.debug(f"Rendering menu: {menu_data.get('screen_name', 'Unnamed')}")
-    
-    # For now, just clear the screen and write the menu title
-    canvas_screen.delete("all")
-    
-    # Initialize image list to keep references
-    canvas_screen.images = []
-    
-    background = menu_data['background']
-    if 'background_color' in background.keys():
-        background_color = background['background_color'] # returns a dict with r,g,b keys 
-        # convert to hex color
-        background_color = f"#{background_color['r']:02x}{background_color['g']:02x}{background_color['b']:02x}"
-        logger.debug(f"Using background color: {background_color}")
-        canvas_screen.create_rectangle(0, 0, PAGER_SCREEN_WIDTH, PAGER_SCREEN_HEIGHT, fill=background_color)
-
-    if 'layers' in background.keys():
-        layers: list = background['layers']
-        for layer in layers:
-            if 'image_path' in layer.keys():
-                image_path = layer['image_path']
-                if os.path.isfile(image_path):
-                    logger.debug(f"Loading background layer image from path: {image_path}")
-                    image = PhotoImage(file=image_path)
-                    canvas_screen.create_image(layer['x'], layer['y'], anchor=NW, image=image)
-                    # Keep a reference to all images to prevent garbage collection
-                    canvas_screen.images.append(image)
-                else:
-                    logger.warning(f"Background layer image file not found: {image_path}")
-    if 'title' in menu_data:
-        canvas_screen.create_text(PAGER_SCREEN_WIDTH//2, 20, text=menu_data['title'], fill="white", font=("Arial", 16))
+# Theme model
+# The expanded JSON of a menu or status bar is turned into these objects once, when the menu is built. Defaults,
+# absolute positions, font size offsets and palette colors are resolved and layers whose image file doesn't exist
+# are dropped, so navigation and drawing only read attributes. The JSON stays available as menu_data for the tools
+# that check or export the theme data itself (validation, explorer, bundles).
+
+# y offset of text per font size, the glyph sheets have different amounts of space above the letters
+TEXT_SIZE_Y_OFFSETS = {"small": 0, "medium": 2, "large": 4}
+
+class theme_model:
+    __slots__ = ()
+    
+    def __repr__(self):
+        return f"{type(self).__name__}(" + ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__) + ")"
+
+# image drawn at an absolute position, recolored with a palette color that exists (None draws the original colors)
+class layer_model(theme_model):
+    __slots__ = ("image_path", "x", "y", "recolor_palette")
+    
+    def __init__(self, image_path: str, x: int, y: int, recolor_palette=None):
+        self.image_path = image_path
+        self.x = x
+        self.y = y
+        self.recolor_palette = recolor_palette
+
+# text run drawn with the pager_custom font, y already contains the offset of the font size
+class text_layer_model(theme_model):
+    __slots__ = ("text", "x", "y", "font_size", "color_name")
+    
+    def __init__(self, text: str, x: int, y: int, font_size: str, color_name):
+        self.text = text
+        self.x = x
+        self.y = y
+        self.font_size = font_size
+        self.color_name = color_name
+
+class menu_item_model(theme_model):
+    __slots__ = ("target", "button_map", "layers", "selected_layers")
+    
+    def __init__(self, target, button_map, layers: list, selected_layers: list):
+        self.target = target
+        self.button_map = button_map
+        self.layers = layers
+        self.selected_layers = selected_layers
+
+# menu_items is None when the page has no menu_items, the items shown before are kept then
+class page_model(theme_model):
+    __slots__ = ("menu_items",)
+    
+    def __init__(self, menu_items):
+        self.menu_items = menu_items
+
+class menu_model(theme_model):
+    __slots__ = ("screen_name", "background_color", "background_layers", "title", "labels", "status_bar", "button_map", "menu_items", "pages")
+    
+    def __init__(self, screen_name: str, background_color, background_layers: list, title, labels: list, status_bar, button_map: dict, menu_items: list, pages: list):
+        self.screen_name = screen_name
+        self.background_color = background_color
+        self.background_layers = background_layers
+        self.title = title
+        self.labels = labels
+        self.status_bar = status_bar
+        self.button_map = button_map
+        self.menu_items = menu_items
+        self.pages = pages
+    
+    # menu items shown on a page, the same way load_menu picks them
+    def page_items(self, page_index: int) -> list:
+        if self.pages and not self.menu_items and 0 <= page_index < len(self.pages) and self.pages[page_index].menu_items is not None:
+            return self.pages[page_index].menu_items
+        return self.menu_items
+    
+    # button map use_button_map works with: the item's own button_map on paged menus, else the menu's
+    def state_button_map(self, page_index: int, item_index: int) -> dict:
+        items = self.page_items(page_index)
+        if self.pages and not self.menu_items and 0 <= item_index < len(items) and items[item_index].button_map is not None:
+            return items[item_index].button_map
+        return self.button_map
+
+# layer of every state of a status bar item, None for states that draw nothing
+class status_item_model(theme_model):
+    __slots__ = ("states",)
+    
+    def __init__(self, states: dict):
+        self.states = states
+
+class status_bar_model(theme_model):
+    __slots__ = ("items",)
+    
+    def __init__(self, items: dict):
+        self.items = items
+
+# palette name if the palette has the color, recoloring with an unknown name draws the original colors
+def resolve_palette_name(color_name, location: str):
+    if color_name is None or color_name in palette:
+        return color_name
+    logger.warning(f"Palette color '{color_name}' of {location} not found. Using original colors.")
+    return None
+
+# image layer at base_x, base_y plus the offset of the layer, None if the layer has no image or the file is missing
+def build_layer(layer: dict, base_x, base_y, location: str, recolor=False):
+    if 'image_path' not in layer:
+        return None
+    image_path = layer['image_path']
+    if path_kind(image_path) != 'file':
+        logger.warning(f"{location} image file not found: {image_path}")
+        return None
+    recolor_palette = resolve_palette_name(layer.get('recolor_palette'), location) if recolor else None
+    return layer_model(image_path, int(layer.get('x', 0) + base_x), int(layer.get('y', 0) + base_y), recolor_palette)
+
+# drawing order of a menu item layer list: the image of a layer is drawn before its text
+def build_item_layers(layers: list, base_x, base_y) -> list:
+    built = []
+    for layer in layers:
+        image_layer = build_layer(layer, base_x, base_y, "Menu item", recolor=True)
+        if image_layer is not None:
+            built.append(image_layer)
+        if 'text' in layer:
+            font_size = layer.get('text_size', 'medium')
+            if font_size not in TEXT_SIZE_Y_OFFSETS:
+                font_size = "medium"
+            x = int(layer.get('x', 0) + base_x)
+            y = int(layer.get('y', 0) + base_y + TEXT_SIZE_Y_OFFSETS[font_size])
+            color_name = resolve_palette_name(layer.get('text_color_palette', 'white'), "Menu item text")
+            built.append(text_layer_model(str(layer['text']), x, y, font_size, color_name))
+    return built
+
+def build_menu_item(item: dict) -> menu_item_model:
+    base_x = item.get('x', 0)
+    base_y = item.get('y', 0)
+    return menu_item_model(item.get('target'), item.get('button_map'), build_item_layers(item.get('layers', []), base_x, base_y),
+                           build_item_layers(item.get('selected_layers', []), base_x, base_y))
+
+# the menu items and pages come from item_data when it is given: a template menu is drawn with its template,
+# but navigates the menu items and pages of the menu itself
+def build_menu_model(menu_data: dict, item_data: dict = None) -> menu_model:
+    if item_data is None:
+        item_data = menu_data
+    background = menu_data.get('background', {})
+    background_color = None
+    if 'background_color' in background:
+        color = background['background_color']
+        background_color = (color['r'], color['g'], color['b'], 255)
+    background_layers = [layer for layer in (build_layer(layer, 0, 0, "Background layer") for layer in background.get('layers', [])) if layer is not None]
+    return menu_model(
+        menu_data.get('screen_name', 'Unnamed'),
+        background_color,
+        background_layers,
+        menu_data.get('title'),
+        [item.get('label', 'Unnamed') for item in menu_data.get('items', [])],
+        menu_data.get('status_bar'),
+        menu_button_map(menu_data),
+        [build_menu_item(item) for item in item_data.get('menu_items', [])],
+        [page_model([build_menu_item(item) for item in page_data['menu_items']] if 'menu_items' in page_data else None) for page_data in item_data.get('pages', [])],
+    )
+
+# the first layer of every state, the brightness layer is placed at the item position only
+def build_status_bar_model(status_bar_data: dict) -> status_bar_model:
+    items = {}
+    for status_bar_item_name, status_bar_item in status_bar_data.get("status_bar_items", {}).items():
+        base_x = status_bar_item.get('x', 0)
+        base_y = status_bar_item.get('y', 0)
+        states = {}
+        for state, layers in status_bar_item.get('layers', {}).items():
+            layer = layers[0] if layers else {}
+            state_layer = build_layer(layer, base_x, base_y, "Status bar")
+            if state_layer is not None and status_bar_item_name == "Brightness":
+                state_layer.x, state_layer.y = int(base_x), int(base_y)
+            states[state] = state_layer
+        items[status_bar_item_name] = status_item_model(states)
+    return status_bar_model(items)
+
+# draw the complete screen of a menu into the framebuffer and return it
+@traced
+def render_frame(screen: menu_model) -> Image.Image:
+    global background_frame, status_bar_region, drawn_region, frame_key, display_list_menu
+    # the display lists of the menu shown before hold on to its images, only the shown menu keeps them
+    if display_list_menu is not None and display_list_menu is not menu:
+        release_display_lists(display_list_menu)
+    display_list_menu = menu
+    render_menu(screen)
+    # keep the frame without items, incremental redraws restore damaged regions from it
+    background_frame = framebuffer.copy()
+    draw_menu_items()
+    drawn_region = None
+    draw_status_bar()
+    status_bar_region = drawn_region
+    frame_key = (menu_target, selected_page, id(menu_items))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Image cache: {layer_image_cache.stats()}")
+    return framebuffer
+
+# redraw only the item that lost and the item that gained the selection instead of the whole frame
+# the damaged regions (old and new extent of both items) are restored from the background frame, every item and
+# the status bar overlapping them is drawn again in order, and only those regions are copied into the frame
+@traced
+def redraw_selection_change(previous_item: int):
+    global item_regions
+    changed = {previous_item: False, selected_menu_item: True}
+    dirty = [item_regions[index] for index in changed]
+    for index, is_selected in changed.items():
+        dirty.append(item_display_list(menu_items[index], is_selected)[1])
+    dirty = [rect for rect in dirty if rect is not None]
+    redraw_regions(dirty, changed_items=changed)
+    logger.debug(f"Redrew {len(dirty)} regions for selection change {previous_item} -> {selected_menu_item}")
+
+# restore the dirty regions from the background frame and draw the changed items, the items overlapping the
+# regions and the status bar again in order, then copy only those regions into the frame
+def redraw_regions(dirty: list, changed_items=(), status_bar_changed=False):
+    global framebuffer, item_regions, status_bar_region, drawn_region
+    if not dirty:
+        return
+    
+    screen = framebuffer
+    framebuffer = background_frame.copy()
+    try:
+        for index, item in enumerate(menu_items):
+            if index in changed_items or rect_intersects(item_regions[index], dirty):
+                item_regions[index] = draw_menu_item(item, index == selected_menu_item)
+        if status_bar_changed or rect_intersects(status_bar_region, dirty):
+            drawn_region = None
+            draw_status_bar()
+            status_bar_region = drawn_region
+        redrawn = framebuffer
+    finally:
+        framebuffer = screen
+    for rect in dirty:
+        framebuffer.paste(redrawn.crop(rect), rect[:2])
+
+# push the framebuffer to the canvas as one image, the PhotoImage and its canvas item are reused between frames
+# with --scale the finished frame is enlarged once (nearest neighbour keeps the pixels sharp), the drawing and the
+# number of canvas items stay the same
+def present_frame():
+    global canvas_screen, screen_photo_image
+    if canvas_screen is None:
+        tracer.frame_done()
+        return  # headless, the frame stays in the framebuffer
+    frame = framebuffer
+    if preview_scale > 1:
+        frame = framebuffer.resize((PAGER_SCREEN_WIDTH * preview_scale, PAGER_SCREEN_HEIGHT * preview_scale), Image.Resampling.NEAREST)
+    if screen_photo_image is None:
+        screen_photo_image = ImageTk.PhotoImage(frame)
+        canvas_screen.create_image(0, 0, anchor=NW, image=screen_photo_image)
+        tracer.count("canvas items")
+    else:
+        screen_photo_image.paste(frame)
+    tracer.frame_done()
+
+# load an image file as RGBA for compositing into the framebuffer
+def open_image(image_path: str) -> Image.Image:
+    if theme_bundle is not None:
+        image = theme_bundle.image(image_path)
+        if image is not None:
+            return image
+    tracer.count("file opens")
+    tracer.count("png decodes")
+    with Image.open(image_path) as image:
+        return image.convert('RGBA')
+
+# bounded LRU cache of decoded (and recolored) layer images and rendered text runs, shared by all menus and status bars
+# layer images are keyed by (path, mtime, recolor color) so a changed file or palette color is never served from the cache
+class image_cache:
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self.images = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # the prefetcher fills the cache from worker threads
+        self.lock = threading.Lock()
+    
+    def get(self, image_path: str, recolor_palette=None) -> Image.Image:
+        color = palette.get(recolor_palette) if recolor_palette is not None else None
+        key = (image_path, path_mtime(image_path), recolor_palette if color is None else (color.get('r', 0), color.get('g', 0), color.get('b', 0)))
+        
+        def decode():
+            image = open_image(image_path)
+            return recolor_image(image, recolor_palette) if recolor_palette is not None else image
+        return self.lookup(key, decode)
+    
+    # cached image of key, create() makes it on a miss; None (e.g. a text run without glyphs) is cached as well
+    def lookup(self, key, create):
+        with self.lock:
+            if key in self.images:
+                self.hits += 1
+                self.images.move_to_end(key)
+                return self.images[key]
+            self.misses += 1
+        
+        # decode outside of the lock, Pillow releases the GIL while decoding
+        image = create()
+        image_bytes = image_size_bytes(image)
+        if image_bytes > self.budget_bytes:
+            return image  # would evict everything else
+        with self.lock:
+            if key not in self.images:
+                self.images[key] = image
+                self.size_bytes += image_bytes
+            while self.size_bytes > self.budget_bytes:
+                _, evicted = self.images.popitem(last=False)
+                self.size_bytes -= image_size_bytes(evicted)
+                self.evictions += 1
+        return image
+    
+    def clear(self):
+        with self.lock:
+            self.images.clear()
+            self.size_bytes = 0
+    
+    def stats(self) -> str:
+        return f"{self.hits} hits, {self.misses} misses, {self.evictions} evictions, {len(self.images)} images, {self.size_bytes / (1024 * 1024):.1f} of {self.budget_bytes / (1024 * 1024):.1f} MiB"
+
+# decoded RGBA bytes of a cached image
+def image_size_bytes(image) -> int:
+    return image.width * image.height * 4 if image is not None else 0
+
+layer_image_cache = image_cache(DEFAULT_IMAGE_CACHE_BYTES)
+
+# decoded layer image, recolored with the palette color if given; the image is shared, don't modify it
+def load_layer_image(image_path: str, recolor_palette=None) -> Image.Image:
+    return layer_image_cache.get(image_path, recolor_palette)
+
+# alpha blend an image into the framebuffer at x, y, parts outside of the screen are clipped
+def blit_image(image: Image.Image, x, y):
+    global framebuffer, drawn_region
+    x, y = int(x), int(y)
+    rect = screen_rect(image, x, y)
+    if rect is None:
+        return  # completely off screen
+    left, top, right, bottom = rect
+    framebuffer.alpha_composite(image, dest=(left, top), source=(left - x, top - y, right - x, bottom - y))
+    drawn_region = union_rect(drawn_region, rect)
+
+# (left, top, right, bottom) of an image drawn at x, y clipped to the screen, None if it is off screen
+def screen_rect(image: Image.Image, x, y):
+    x, y = int(x), int(y)
+    left, top = max(x, 0), max(y, 0)
+    right, bottom = min(x + image.width, PAGER_SCREEN_WIDTH), min(y + image.height, PAGER_SCREEN_HEIGHT)
+    if left >= right or top >= bottom:
+        return None
+    return (left, top, right, bottom)
+
+def union_rect(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+def rect_intersects(rect, rects: list) -> bool:
+    if rect is None:
+        return False
+    return any(rect[0] < other[2] and other[0] < rect[2] and rect[1] < other[3] and other[1] < rect[3] for other in rects)
+
+# DejaVu Sans in the given size for the plain text parts of a menu
+def load_ui_font(size: int) -> ImageFont.FreeTypeFont:
+    global ui_fonts
+    if size not in ui_fonts:
+        ui_fonts[size] = ImageFont.truetype(os.path.join(os.path.dirname(FONT_DIR), "DejaVuSans.ttf"), size)
+    return ui_fonts[size]
+
+# Display lists
+# What a menu draws is compiled once into flat lists of draw operations and kept in the render_cache of the menu:
+# one list for the background and one per menu item and selection, plus the item lists of every shown
+# page/selection state. A frame executes these lists, decoding, recoloring, positioning and clipping happen at
+# compile time, so the cost of a frame only depends on the number of operations.
+# Operations: (DRAW_FILL, color, rect), (DRAW_TEXT, xy, text, font, anchor) and
+# (DRAW_IMAGE or DRAW_GLYPH_RUN, image, destination, source box, rect) with the image already clipped to the screen
+DRAW_FILL, DRAW_IMAGE, DRAW_GLYPH_RUN, DRAW_TEXT = range(4)
+
+# menu whose display lists are cached, see render_frame
+display_list_menu = None
+
+# image operation for an image drawn at x, y, None if it is completely off screen
+def image_op(kind: int, image: Image.Image, x: int, y: int):
+    rect = screen_rect(image, x, y)
+    if rect is None:
+        return None
+    left, top, right, bottom = rect
+    return (kind, image, (left, top), (left - x, top - y, right - x, bottom - y), rect)
+
+def compile_background(screen: menu_model) -> list:
+    ops = []
+    if screen.background_color is not None:
+        ops.append((DRAW_FILL, screen.background_color, (0, 0, PAGER_SCREEN_WIDTH, PAGER_SCREEN_HEIGHT)))
+    for layer in screen.background_layers:
+        ops.append(image_op(DRAW_IMAGE, load_layer_image(layer.image_path), layer.x, layer.y))
+    if screen.title is not None:
+        ops.append((DRAW_TEXT, (PAGER_SCREEN_WIDTH//2, 20), screen.title, load_ui_font(16), "mm"))
     # Render menu items
-    if 'items' in menu_data:
-        for index, item in enumerate(menu_data['items']):
-            y_position = 50 + index * 30
-            canvas_screen.create_text(20, y_position, text=item.get('label', 'Unnamed'), anchor='w', fill="white", font=("Arial", 12))
+    for index, label in enumerate(screen.labels):
+        ops.append((DRAW_TEXT, (20, 50 + index * 30), label, load_ui_font(12), "lm"))
+    return [op for op in ops if op is not None]
+
+# operations of one menu item and the screen region they cover
+def compile_menu_item(item: menu_item_model, is_selected: bool):
+    ops = []
+    region = None
+    for layer in item.selected_layers if is_selected else item.layers:
+        if type(layer) is text_layer_model:
+            run_image = render_text_run(layer.text, layer.font_size, layer.color_name)
+            op = image_op(DRAW_GLYPH_RUN, run_image, layer.x, layer.y) if run_image is not None else None
+        else:
+            # decoded and recolored images come from the image cache
+            op = image_op(DRAW_IMAGE, load_layer_image(layer.image_path, layer.recolor_palette), layer.x, layer.y)
+        if op is not None:
+            ops.append(op)
+            region = union_rect(region, op[4])
+    return ops, region
+
+# cached display lists of the shown menu (menu), screen is its model
+def background_display_list(screen: menu_model) -> list:
+    key = ("background",)
+    if key not in menu.render_cache:
+        menu.render_cache[key] = compile_background(screen)
+    return menu.render_cache[key]
+
+def item_display_list(item: menu_item_model, is_selected: bool):
+    key = ("item", id(item), is_selected)
+    if key not in menu.render_cache:
+        menu.render_cache[key] = compile_menu_item(item, is_selected)
+    return menu.render_cache[key]
+
+# (operations, region) of every shown menu item for the current page and selection
+def items_display_list() -> list:
+    key = ("items", id(menu_items), selected_menu_item)
+    if key not in menu.render_cache:
+        menu.render_cache[key] = [item_display_list(item, index == selected_menu_item) for index, item in enumerate(menu_items)]
+    return menu.render_cache[key]
+
+def release_display_lists(state_menu):
+    render_cache = state_menu.render_cache
+    for key in [key for key in render_cache if key[0] in ("background", "item", "items")]:
+        del render_cache[key]
+
+# draw the operations into the framebuffer and return the region they cover
+def execute_display_list(ops: list):
+    global drawn_region
+    region = None
+    for op in ops:
+        kind = op[0]
+        if kind == DRAW_FILL:
+            framebuffer.paste(op[1], op[2])
+            region = union_rect(region, op[2])
+        elif kind == DRAW_TEXT:
+            ImageDraw.Draw(framebuffer).text(op[1], op[2], fill="white", font=op[3], anchor=op[4])
+        else:
+            framebuffer.alpha_composite(op[1], dest=op[2], source=op[3])
+            region = union_rect(region, op[4])
+    drawn_region = union_rect(drawn_region, region)
+    return region
+
+# Renders the menu on the screen in the frame
+@traced
+def render_menu(screen: menu_model):
+    global framebuffer
+    logger.debug(f"Rendering menu: {screen.screen_name}")
+    
+    # Start a new frame, the screen is black where the menu draws nothing
+    framebuffer = Image.new('RGBA', (PAGER_SCREEN_WIDTH, PAGER_SCREEN_HEIGHT), (0, 0, 0, 255))
+    execute_display_list(background_display_list(screen))
 
 # create menus based on theme data and returns a list of generic_menu objects
+@traced
 def create_menus(theme_data, theme_path) -> list:
     menus = {}
+    if theme_bundle is not None and theme_data is theme_bundle.theme_data:
+        return {key: lazy_menu(menu_data, theme_path) for key, menu_data in theme_bundle.menus.items()}
     #pprint(list(theme_data.keys()))
     #pprint(theme_data)
     for key, value in theme_data.items():
@@ -342,7 +1286,7 @@ def create_menus(theme_data, theme_path) -> list:
             continue  # skip status_bars key
         # Check if the value is already a loaded menu dictionary (has screen_name)
         if isinstance(value, dict) and 'screen_name' in value:
-            menu = generic_menu(value, theme_path)
+            menu = lazy_menu(value, theme_path)
             menus[key] = menu
             '''if 'screen_name' in menu.menu_data:
                 menus[menu.menu_data['screen_name']] = menu
@@ -353,15 +1297,20 @@ def create_menus(theme_data, theme_path) -> list:
         # if the value is a dictionary, check if it has nested menu dictionaries
         elif isinstance(value, dict):
             if key.endswith('_path'):
-                menu = generic_menu(value, theme_path)
+                menu = lazy_menu(value, theme_path)
                 menus[key] = menu
                 logger.debug(f"Created menu from path in key: {key}")
             else:
                 for sub_key, sub_value in value.items():
                     if isinstance(sub_value, dict) and 'screen_name' in sub_value:
-                        menu = generic_menu(sub_value, theme_path)
+                        menu = lazy_menu(sub_value, theme_path)
                         menus[sub_key] = menu
                         logger.debug(f"Created menu from sub-key: {sub_key} in key: {key}")
+                    # a menu JSON file that load_theme kept as a path
+                    elif isinstance(sub_value, str) and sub_key.endswith('_path') and sub_value.endswith('.json'):
+                        menu = lazy_menu(sub_value, theme_path)
+                        menus[sub_key] = menu
+                        logger.debug(f"Created menu from path in sub-key: {sub_key} in key: {key}")
         elif isinstance(value, str):
             logger.info(f"Processing string value for key: {key} with value: {value}")
             # check if the value is a path to a menu json file
@@ -369,7 +1318,7 @@ def create_menus(theme_data, theme_path) -> list:
                 continue
             if value.endswith('.png'):
                 continue  # skip image files
-            menu = generic_menu(value, theme_path)
+            menu = lazy_menu(value, theme_path)
             menus[key] = menu
             logger.debug(f"Created menu from path in key: {key}")
     
@@ -383,118 +1332,75 @@ def create_menus(theme_data, theme_path) -> list:
     return menus
 
 # create status bars based on theme data and returns a list of status bar objects
+@traced
 def create_status_bars(theme_data, theme_path) -> list:
     status_bars = {}
+    if theme_bundle is not None and theme_data is theme_bundle.theme_data:
+        return {key: lazy_menu(status_bar_data, theme_path, is_status_bar=True) for key, status_bar_data in theme_bundle.status_bars.items()}
     if 'status_bars' in theme_data:
         for status_bar_name, status_bar_path in theme_data['status_bars'].items():
-            status_bar = generic_menu(status_bar_path, theme_path)
+            status_bar = lazy_menu(status_bar_path, theme_path, is_status_bar=True)
             status_bars[status_bar_name] = status_bar
             logger.debug(f"Created status bar: {status_bar_name}")
     return status_bars
 
-# make paths absolute in dictionary only if it exists
-def make_paths_absolute(d: dict, base_path: str) -> dict:
-    for key, value in d.items():
-        if isinstance(value, str):
-            if not os.path.isabs(value):
-                candidate = os.path.abspath(os.path.join(base_path, value))
-                if os.path.exists(candidate):
-                    d[key] = candidate
-        elif isinstance(value, dict):
-            d[key] = make_paths_absolute(value, base_path)
-        elif isinstance(value, list):
-            d[key] = make_list_paths_absolute(value, base_path)
-    return d
-
-# make paths absolute in list
-def make_list_paths_absolute(lst: list, base_path: str) -> list:
-    for i in range(len(lst)):
-        logger.debug(f"Making paths absolute in list {lst}")
-        logger.debug(f"Processing list index {i} with value: {lst[i]}")
-        value = lst[i]
-        if isinstance(value, str):
-            if not os.path.isabs(value):
-                candidate = os.path.abspath(os.path.join(base_path, value))
-                if os.path.exists(candidate):
-                    lst[i] = candidate
-        elif isinstance(value, dict):
-            lst[i] = make_paths_absolute(value, base_path)
-        elif isinstance(value, list):
-            lst[i] = make_list_paths_absolute(value, base_path)
-    return lst
-
+@traced
 def load_menu():
-    global button_map, menu_index, selected_menu_item, selected_page, menu, canvas_screen, menu_items, pages, a_button, b_button, up_button, down_button, left_button, right_button
-    menu_data = menu.menu_data
-    logger.debug(f"Loading menu: {menu.menu_data.get('screen_name', 'Unnamed')}")
+    global button_map, selected_menu_item, selected_page, menu, menu_items, pages, a_button, b_button, up_button, down_button, left_button, right_button
+    screen = menu.model
+    logger.debug(f"Loading menu: {screen.screen_name}")
     
     # button_map
-    if 'button_map' in menu_data:
-        button_map = menu_data['button_map']
-    else:
-        button_map = {
-            'a': 'select',
-            'b': 'back',
-            'up': 'previous',
-            'down': 'next',
-            'left': 'previous_page',
-            'right': 'next_page'
-        }
-    
-    if button_map['a'] == "noop":
-        a_button.config(state=DISABLED)
-    else:
-        a_button.config(state=NORMAL)
-    if button_map['b'] == "noop":
-        b_button.config(state=DISABLED)
-    else:
-        b_button.config(state=NORMAL)
-    
-    a_button.config(text=button_map['a'].upper())
-    b_button.config(text=button_map['b'].upper())
-    
-    if button_map['up'] == "noop":
-        up_button.config(state=DISABLED)
-    else:
-        up_button.config(state=NORMAL)
+    button_map = screen.button_map
     
-    if button_map['down'] == "noop":
-        down_button.config(state=DISABLED)
-    else:
-        down_button.config(state=NORMAL)
-    
-    if button_map['left'] == "noop":
-        left_button.config(state=DISABLED)
-    else:
-        left_button.config(state=NORMAL)
-    
-    if button_map['right'] == "noop":
-        right_button.config(state=DISABLED)
-    else:
-        right_button.config(state=NORMAL)
-    
-    up_button.config(text=button_map['up'].upper())
-    down_button.config(text=button_map['down'].upper())
-    left_button.config(text=button_map['left'].upper())
-    right_button.config(text=button_map['right'].upper())
+    configure_buttons()
 
-    logger.debug("Button states and labels configured. Button map: " + str(button_map))
+    logger.debug("Button states and labels configured. Button map: %s", button_map)
     
     
     menu_items = menu.menu_items
     pages = menu.pages
-    logger.debug(f"Loaded menu items({len(menu_items)}): " + str(menu_items))
-    logger.debug(f"Loaded menu pages({len(pages)}): " + str(pages))
+    logger.debug("Loaded menu items(%s): %s", len(menu_items), menu_items)
+    logger.debug("Loaded menu pages(%s): %s", len(pages), pages)
     
     # when pages contains data and menu_items is empty, load menu_items from the selected page
     if pages and not menu_items:
         page_data = pages[selected_page]
-        if 'menu_items' in page_data:
-            menu_items = page_data['menu_items']
-            logger.debug(f"Loaded menu items from selected page {selected_page}: " + str(menu_items))
-            if 'button_map' in menu_items[selected_menu_item]:
-                button_map = menu_items[selected_menu_item]['button_map']
-                logger.debug(f"Loaded button map from selected menu item {selected_menu_item}: " + str(button_map))
+        if page_data.menu_items is not None:
+            menu_items = page_data.menu_items
+            logger.debug("Loaded menu items from selected page %s: %s", selected_page, menu_items)
+            if menu_items[selected_menu_item].button_map is not None:
+                button_map = menu_items[selected_menu_item].button_map
+                logger.debug("Loaded button map from selected menu item %s: %s", selected_menu_item, button_map)
+    
+    configure_buttons()
+
+    logger.debug("Rendering the menu: " + screen.screen_name)
+    render_frame(screen)
+    present_frame()
+    if prefetcher is not None:
+        prefetcher.schedule(menu_target, selected_page, selected_menu_item)
+    #pprint(menu_data)
+# generic_menu class which contains the information from generic_menus key in theme.json for one menu 
+
+# button_map of a menu, or the default mapping if the menu has none
+def menu_button_map(menu_data: dict) -> dict:
+    if 'button_map' in menu_data:
+        return menu_data['button_map']
+    return {
+        'a': 'select',
+        'b': 'back',
+        'up': 'previous',
+        'down': 'next',
+        'left': 'previous_page',
+        'right': 'next_page'
+    }
+
+# enable/disable the pager buttons and label them with the current button_map, does nothing without a GUI
+def configure_buttons():
+    global button_map, a_button, b_button, up_button, down_button, left_button, right_button
+    if a_button is None:
+        return
     
     if button_map['a'] == "noop":
         a_button.config(state=DISABLED)
@@ -533,280 +1439,273 @@ def load_menu():
     left_button.config(text=button_map['left'].upper())
     right_button.config(text=button_map['right'].upper())
 
-    logger.debug("Rendering the menu: " + menu_data['screen_name'])
-    render_menu(menu_data)
-    draw_menu_items()
-    draw_status_bar()
-    #pprint(menu_data)
-# generic_menu class which contains the information from generic_menus key in theme.json for one menu 
+# every target string that leads to a menu mapped to its key in menus: the keys themselves and, for keys ending
+# in '_path', the key without the suffix (a key without the suffix wins over such an alias)
+def build_target_index(menus_by_key: dict) -> dict:
+    index = {}
+    for key in menus_by_key:
+        if key.endswith('_path'):
+            index.setdefault(key[:-len('_path')], key)
+    for key in menus_by_key:
+        index[key] = key
+    return index
+
+# key in menus of a menu target, targets may leave out the '_path' suffix of the key. None if there is no such menu
+# the target index is built once for every new menus dict (after create_menus or a reload)
+def resolve_menu_target(target: str):
+    global target_index, target_index_menus
+    if target_index_menus is not menus:
+        target_index = build_target_index(menus)
+        target_index_menus = menus
+    return target_index.get(target)
 
 # update menu
+@traced
 def update_menu():
     global menu, menu_target, menus, selected_menu_item, selected_page
     logger.info(f"Updating menu to target: {menu_target}")
-    if menu_target in menus:
-        menu = menus[menu_target]
-    elif  f'{menu_target}_path' in menus.keys():
-        menu_target = menu_target + '_path'
+    menu_key = resolve_menu_target(menu_target)
+    if menu_key is not None:
+        menu_target = menu_key
         menu = menus[menu_target]
     else:
         logger.warning(f"Menu target '{menu_target}' not found in menus.")
         logger.warning("Available menus: " + str(list(menus.keys())))
         return
     
-    if 'template' in menu.menu_data:
-        menu.menu_data = menu.menu_data['template']
-    
     load_menu()
 
 
 # update currently loaded page
+@traced
 def update_page():
     global selected_page, pages, menu_items, selected_menu_item, button_map, a_button, b_button, up_button, down_button, left_button, right_button
     logger.info(f"Updating to page index: {selected_page}")
     pages = menu.pages
-    logger.debug(f"Loaded menu items({len(menu_items)}): " + str(menu_items))
-    logger.debug(f"Loaded menu pages({len(pages)}): " + str(pages))
+    logger.debug("Loaded menu items(%s): %s", len(menu_items), menu_items)
+    logger.debug("Loaded menu pages(%s): %s", len(pages), pages)
     
     # when pages contains data and menu_items is empty, load menu_items from the selected page
     
     page_data = pages[selected_page]
-    if 'menu_items' in page_data:
-        menu_items = page_data['menu_items']
-        logger.debug(f"Loaded menu items from selected page {selected_page}: " + str(menu_items))
-        if 'button_map' in menu_items[selected_menu_item]:
-            button_map = menu_items[selected_menu_item]['button_map']
-            logger.debug(f"Loaded button map from selected menu item {selected_menu_item}: " + str(button_map))
-    
-    if button_map['a'] == "noop":
-        a_button.config(state=DISABLED)
-    else:
-        a_button.config(state=NORMAL)
-    if button_map['b'] == "noop":
-        b_button.config(state=DISABLED)
-    else:
-        b_button.config(state=NORMAL)
-    
-    a_button.config(text=button_map['a'].upper())
-    b_button.config(text=button_map['b'].upper())
-    
-    if button_map['up'] == "noop":
-        up_button.config(state=DISABLED)
-    else:
-        up_button.config(state=NORMAL)
-    
-    if button_map['down'] == "noop":
-        down_button.config(state=DISABLED)
-    else:
-        down_button.config(state=NORMAL)
-    
-    if button_map['left'] == "noop":
-        left_button.config(state=DISABLED)
-    else:
-        left_button.config(state=NORMAL)
-    
-    if button_map['right'] == "noop":
-        right_button.config(state=DISABLED)
-    else:
-        right_button.config(state=NORMAL)
-    
-    up_button.config(text=button_map['up'].upper())
-    down_button.config(text=button_map['down'].upper())
-    left_button.config(text=button_map['left'].upper())
-    right_button.config(text=button_map['right'].upper())
+    if page_data.menu_items is not None:
+        menu_items = page_data.menu_items
+        logger.debug("Loaded menu items from selected page %s: %s", selected_page, menu_items)
+        if menu_items[selected_menu_item].button_map is not None:
+            button_map = menu_items[selected_menu_item].button_map
+            logger.debug("Loaded button map from selected menu item %s: %s", selected_menu_item, button_map)
+    
+    configure_buttons()
 
 # draw menu items on the screen
+@traced
 def draw_menu_items():
-    global selected_menu_item, menu_items, canvas_screen
+    global selected_menu_item, menu_items, item_regions
     logger.info("Drawing menu items")
-    for index, item in enumerate(menu_items):
-        is_selected = (index == selected_menu_item)
-        if is_selected:
-            layer = item['selected_layers']
-        else:
-            if 'layers' in item:
-                layer = item['layers']
-            else:
-                layer = []
-        
-        base_x = item.get('x', 0)
-        base_y = item.get('y', 0)
-        # draw the layer on the screen
-        for i in range(len(layer)):
-            layer_item = layer[i]
-            if 'image_path' in layer_item:
-                image_path = layer_item['image_path']
-                if os.path.isfile(image_path):
-                    logger.debug(f"Loading menu item image from path: {image_path}")
-                    if 'x' in layer_item:
-                        x = layer_item['x']+base_x
-                    else:
-                        x = base_x
-                    
-                    if 'y' in layer_item:
-                        y = layer_item['y']+base_y
-                    else:
-                        y = base_y
-                
-                    if 'recolor_palette' in layer_item.keys():
-                        # recolor the image based on the palette
-                        pil_image = Image.open(image_path).convert('RGBA')
-                        recolored_image = recolor_image(pil_image, layer_item['recolor_palette'])
-                        image = ImageTk.PhotoImage(recolored_image)
-                    else:
-                        image = PhotoImage(file=image_path)
-                    canvas_screen.create_image(x, y, anchor=NW, image=image)
-                    
-                    logger.debug(f"Position of menu item image: x={x}, y={y}")
-                    # Keep a reference to all images to prevent garbage collection
-                    canvas_screen.images.append(image)
-                else:
-                    logger.warning(f"Menu item image file not found: {image_path}")
-            if 'text' in layer_item:
-                text = layer_item['text']
-                
-                if 'x' in layer_item:
-                    x = layer_item['x']+base_x
-                else:
-                    x = base_x
-                
-                if 'y' in layer_item:
-                    y = layer_item['y']+base_y
-                else:
-                    y = base_y
-                
-                fill_color = "white"
-                if 'text_color_palette' in layer_item:
-                    color = layer_item['text_color_palette']
-                    color = palette.get(color, {'r': 255, 'g': 255, 'b': 255})
-                    fill_color = f"#{color['r']:02x}{color['g']:02x}{color['b']:02x}"
-                
-                font_size = layer_item.get('text_size', 'medium')
-                
-                if not (font_size == "small" or font_size == "large" or font_size == "medium"):
-                    font_size = "medium"
-                
-                match font_size:
-                    case "small":
-                        y += 0
-                    case "large":
-                        y += 4
-                    case "medium":
-                        y += 2
-
-                font_location = os.path.dirname(os.path.abspath(__file__)) + "/fonts/pager_custom/" + font_size + "/"
-                
-                for index_char, char in enumerate(text):
-                    char_image_path = font_location + f"{ord(char)}.png"
-                    if os.path.isfile(char_image_path):
-                        char_image = image = Image.open(char_image_path).convert('RGBA')
-                        recolored_char_image = recolor_image(char_image, layer_item.get('text_color_palette', 'white'))
-                        char_photo_image = ImageTk.PhotoImage(recolored_char_image)
-                        canvas_screen.create_image(x + index_char * (char_photo_image.width()), y, anchor=NW, image=char_photo_image)
-                        # Keep a reference to all images to prevent garbage collection
-                        canvas_screen.images.append(char_photo_image)
-                    else:
-                        logger.warning(f"Character image file not found for character '{char}': {char_image_path}")
-                
-                #canvas_screen.create_text(x, y, text=text, anchor=NW, fill=fill_color, font=("DejaVu Sans", font_size))
-                logger.debug(f"Position of menu item text: x={x}, y={y}, text='{text}', color='{fill_color}'")
+    item_regions = [execute_display_list(ops) for ops, _ in items_display_list()]
 
+# draw one menu item and return the screen region it covers
+def draw_menu_item(item: menu_item_model, is_selected: bool):
+    return execute_display_list(item_display_list(item, is_selected)[0])
+
+@traced
 def draw_status_bar():
-    global canvas_screen, status_bars, menu
+    global status_bars, menu
     logger.info("Drawing status bar")
-    if 'status_bar' not in menu.menu_data:
+    if menu.model.status_bar is None:
         logger.debug("No status bar defined for this menu.")
         return
-    status_bar = status_bars.get(menu.menu_data['status_bar'], None)
-    #pprint(status_bar.menu_data)
-    for status_bar_item_name, status_bar_item in status_bar.menu_data["status_bar_items"].items():
-        logger.debug(f"Drawing status bar: {status_bar_item_name}")
-        if status_bar_item_name == "Time":
+    sprite = status_bar_sprite(menu.model.status_bar)
+    if sprite is not None:
+        image, x, y = sprite
+        blit_image(image, x, y)
+
+# current state of each status bar item, the layer with this name is shown for the item
+def status_bar_states() -> dict:
+    return {"Battery": BATTERY, "Volume": VOLUME, "Brightness": BRIGHTNESS, "Vibrate": VIBRATE}
+
+# (image, x, y) with all items of a status bar composed into one image for the current states
+# the sprites are kept on the status bar per state combination, so a state change swaps one cached image
+def status_bar_sprite(status_bar_name: str):
+    global status_bars
+    status_bar = status_bars.get(status_bar_name, None)
+    if status_bar is None:
+        logger.warning(f"Status bar not found: {status_bar_name}")
+        return None
+    states = status_bar_states()
+    key = ("status_bar_sprite",) + tuple(states.values())
+    cached = status_bar.render_cache.get(key)
+    if cached is not None and all(path_mtime(image_path) == mtime for image_path, mtime in cached[1]):
+        return cached[0]
+    
+    placements = []
+    for status_bar_item_name, status_bar_item in status_bar.model.items.items():
+        if status_bar_item_name not in states:
             continue  # skip time for now
-        elif status_bar_item_name == "Battery":
-            # draw battery status bar
-            base_x = status_bar_item.get('x', 0)
-            base_y = status_bar_item.get('y', 0)
-            layers = status_bar_item['layers']
-            #pprint(layers)
-            layer = layers[BATTERY][0]
-            logger.debug(f"Drawing battery layer.")
-            #pprint(layer)
-            if 'image_path' in layer:
-                image_path = layer['image_path']
-                if os.path.isfile(image_path):
-                    logger.debug(f"Loading status bar image from path: {image_path}")
-                    image = PhotoImage(file=image_path)
-                    canvas_screen.create_image(layer['x']+base_x, layer['y']+base_y, anchor=NW, image=image)
-                    # Keep a reference to all images to prevent garbage collection
-                    canvas_screen.images.append(image)
-                else:
-                    logger.warning(f"Status bar image file not found: {image_path}")
-        elif status_bar_item_name == "Volume":
-            # draw volume status bar
-            base_x = status_bar_item.get('x', 0)
-            base_y = status_bar_item.get('y', 0)
-            layers = status_bar_item['layers']
-            #pprint(layers)
-            layer = layers[VOLUME][0]
-            logger.debug(f"Drawing volume layer.")
-            #pprint(layer)
-            if 'image_path' in layer:
-                image_path = layer['image_path']
-                if os.path.isfile(image_path):
-                    logger.debug(f"Loading status bar image from path: {image_path}")
-                    image = PhotoImage(file=image_path)
-                    canvas_screen.create_image(layer['x']+base_x, layer['y']+base_y, anchor=NW, image=image)
-                    # Keep a reference to all images to prevent garbage collection
-                    canvas_screen.images.append(image)
-                else:
-                    logger.warning(f"Status bar image file not found: {image_path}")
-        elif status_bar_item_name == "Brightness":
-            # draw brightness status bar
-            base_x = status_bar_item.get('x', 0)
-            base_y = status_bar_item.get('y', 0)
-            layers = status_bar_item['layers']
-            #pprint(layers)
-            layer = layers[BRIGHTNESS][0]
-            logger.debug(f"Drawing brightness layer.")
-            #pprint(layer)
-            if 'image_path' in layer:
-                image_path = layer['image_path']
-                if os.path.isfile(image_path):
-                    logger.debug(f"Loading status bar image from path: {image_path}")
-                    image = PhotoImage(file=image_path)
-                    canvas_screen.create_image(base_x, base_y, anchor=NW, image=image)
-                    # Keep a reference to all images to prevent garbage collection
-                    canvas_screen.images.append(image)
-                else:
-                    logger.warning(f"Status bar image file not found: {image_path}")
-        elif status_bar_item_name == "Vibrate":
-            # draw vibrate status bar
-            base_x = status_bar_item.get('x', 0)
-            base_y = status_bar_item.get('y', 0)
-            layers = status_bar_item['layers']
-            #pprint(layers)
-            layer = layers[VIBRATE][0]
-            logger.debug(f"Drawing vibrate layer.")
-            #pprint(layer)
-            if 'image_path' in layer:
-                image_path = layer['image_path']
-                if os.path.isfile(image_path):
-                    logger.debug(f"Loading status bar image from path: {image_path}")
-                    image = PhotoImage(file=image_path)
-                    canvas_screen.create_image(layer['x']+base_x, layer['y']+base_y, anchor=NW, image=image)
-                    # Keep a reference to all images to prevent garbage collection
-                    canvas_screen.images.append(image)
-                else:
-                    logger.warning(f"Status bar image file not found: {image_path}")
+        if states[status_bar_item_name] not in status_bar_item.states:
+            logger.warning(f"Status bar item {status_bar_item_name} has no layer for state: {states[status_bar_item_name]}")
+            continue
+        layer = status_bar_item.states[states[status_bar_item_name]]
+        logger.debug(f"Composing status bar: {status_bar_item_name}")
+        if layer is not None:
+            placements.append((load_layer_image(layer.image_path), layer.x, layer.y, layer.image_path))
+    
+    sprite = None
+    if placements:
+        left = min(x for _, x, _, _ in placements)
+        top = min(y for _, _, y, _ in placements)
+        right = max(x + image.width for image, x, _, _ in placements)
+        bottom = max(y + image.height for image, _, y, _ in placements)
+        composed = Image.new('RGBA', (right - left, bottom - top), (0, 0, 0, 0))
+        placed = []
+        for image, x, y, _ in placements:
+            rect = (x - left, y - top, x - left + image.width, y - top + image.height)
+            # items that don't overlap are copied as they are, so blitting the sprite matches blitting each item
+            if rect_intersects(rect, placed):
+                composed.alpha_composite(image, dest=rect[:2])
+            else:
+                composed.paste(image, rect[:2])
+            placed.append(rect)
+        sprite = (composed, left, top)
+    status_bar.render_cache[key] = (sprite, tuple((image_path, path_mtime(image_path)) for _, _, _, image_path in placements))
+    return sprite
+
+# change the state of status bar items at runtime, e.g. from a script simulating a draining battery
+# only the status bar part of the current frame is redrawn
+def set_status_state(battery=None, volume=None, brightness=None, vibrate=None):
+    global BATTERY, VOLUME, BRIGHTNESS, VIBRATE
+    if battery is not None:
+        BATTERY = str(battery)
+    if volume is not None:
+        VOLUME = str(volume)
+    if brightness is not None:
+        BRIGHTNESS = str(brightness)
+    if vibrate is not None:
+        VIBRATE = str(vibrate)
+    logger.info(f"Status bar states: {status_bar_states()}")
+    if frame_key is None or background_frame is None:
+        return  # nothing rendered yet, the next frame uses the new states
+    dirty = [status_bar_region]
+    if menu.model.status_bar is not None:
+        sprite = status_bar_sprite(menu.model.status_bar)
+        if sprite is not None:
+            dirty.append(screen_rect(*sprite))
+    redraw_regions([rect for rect in dirty if rect is not None], status_bar_changed=True)
+    present_frame()
 
+# Tk menu with the states found in the status bar layers, picking one calls set_status_state
+def build_status_menu(root):
+    menubar = Menu(root)
+    status_menu = Menu(menubar, tearoff=0)
+    for status_bar_item_name, current_state in status_bar_states().items():
+        states = set()
+        for status_bar in status_bars.values():
+            status_bar_item = status_bar.model.items.get(status_bar_item_name)
+            if status_bar_item is not None:
+                states.update(status_bar_item.states.keys())
+        if not states:
+            continue
+        state_variable = StringVar(root, value=current_state)
+        item_menu = Menu(status_menu, tearoff=0)
+        for state in sorted(states, key=lambda s: (not s.isdigit(), int(s) if s.isdigit() else 0, s)):
+            item_menu.add_radiobutton(label=state, value=state, variable=state_variable,
+                                      command=lambda name=status_bar_item_name, variable=state_variable: set_status_state(**{name.lower(): variable.get()}))
+        status_menu.add_cascade(label=status_bar_item_name, menu=item_menu)
+        status_menu_variables.append(state_variable)
+    menubar.add_cascade(label="Status", menu=status_menu)
+    root.config(menu=menubar)
+
+
+# load all glyphs of one pager_custom font size once and keep them in memory
+def load_glyph_atlas(font_size: str) -> dict:
+    global glyph_atlases
+    if font_size in glyph_atlases:
+        return glyph_atlases[font_size]
+    
+    if theme_bundle is not None:
+        atlas = theme_bundle.glyph_atlas(font_size)
+        if atlas is not None:
+            glyph_atlases[font_size] = atlas
+            return atlas
+    
+    font_location = os.path.join(FONT_DIR, font_size)
+    atlas_path = os.path.join(font_location, f"{font_size}-font-atlas.png")
+    if os.path.isfile(atlas_path):
+        atlas = load_packed_glyph_atlas(atlas_path)
+        logger.debug(f"Loaded {len(atlas)} glyphs for font size '{font_size}' from: {atlas_path}")
+        glyph_atlases[font_size] = atlas
+        return atlas
+    
+    atlas = {}
+    logger.debug(f"Loading glyph atlas for font size '{font_size}' from: {font_location}")
+    with os.scandir(font_location) as entries:
+        for entry in entries:
+            name, extension = os.path.splitext(entry.name)
+            if extension != '.png' or not name.isdigit():
+                continue  # skip the font sheet and everything that is not a single glyph
+            tracer.count("file opens")
+            tracer.count("png decodes")
+            with Image.open(entry.path) as glyph_image:
+                atlas[chr(int(name))] = glyph_image.convert('RGBA')
+    logger.debug(f"Loaded {len(atlas)} glyphs for font size '{font_size}'")
+    glyph_atlases[font_size] = atlas
+    return atlas
+
+# glyphs of an atlas packed by font_splitter.py, the metrics are read from the same PNG as the pixels
+# every glyph is put back into a cell of its advance width and the sheet height, so it draws like a single glyph PNG
+def load_packed_glyph_atlas(atlas_path: str) -> dict:
+    tracer.count("file opens")
+    tracer.count("png decodes")
+    with Image.open(atlas_path) as atlas_image:
+        metrics = json.loads(atlas_image.text["glyph_metrics"])
+        packed = atlas_image.convert('RGBA')
+    atlas = {}
+    for code_point, glyph in metrics["glyphs"].items():
+        cell = Image.new('RGBA', (glyph["advance"], metrics["cell_height"]), (0, 0, 0, 0))
+        if glyph["width"] and glyph["height"]:
+            source = (glyph["x"], glyph["y"], glyph["x"] + glyph["width"], glyph["y"] + glyph["height"])
+            cell.paste(packed.crop(source), (glyph["offset_x"], glyph["offset_y"]))
+        atlas[chr(int(code_point))] = cell
+    return atlas
+
+# render a whole text run into one recolored image, cached by (text, font size, palette color) in the image cache
+# every character is placed at index * glyph width like the pager does, missing characters leave an empty cell
+def render_text_run(text: str, font_size: str, color_name: str):
+    global palette
+    color = palette.get(color_name) if color_name is not None else None
+    cache_key = ("text run", text, font_size, None if color is None else (color.get('r', 0), color.get('g', 0), color.get('b', 0)))
+    return layer_image_cache.lookup(cache_key, lambda: draw_text_run(text, font_size, color_name))
+
+def draw_text_run(text: str, font_size: str, color_name: str):
+    color = palette.get(color_name) if color_name is not None else None
+    atlas = load_glyph_atlas(font_size)
+    placed_glyphs = []
+    for index_char, char in enumerate(text):
+        glyph = atlas.get(char)
+        if glyph is None:
+            logger.warning(f"Character image file not found for character '{char}' in font size '{font_size}'")
+            continue
+        placed_glyphs.append((index_char * glyph.width, glyph))
+    
+    run_image = None
+    if placed_glyphs:
+        run_width = max(offset + glyph.width for offset, glyph in placed_glyphs)
+        run_height = max(glyph.height for _, glyph in placed_glyphs)
+        run_image = Image.new('RGBA', (run_width, run_height), (0, 0, 0, 0))
+        for offset, glyph in placed_glyphs:
+            run_image.paste(glyph, (offset, 0))
+        if color is not None:
+            run_image = recolor_image(run_image, color_name)
+    return run_image
 
 # recolor image based on palette and on new_color string. this will look up the new_color and replaces every color in the original image with the new_color
+# works on whole bands instead of single pixels: a solid image of the new color takes over the alpha channel of the source
+# and is composited over the source with a mask of the non-transparent pixels, so fully transparent pixels keep their original RGB
+@traced
 def recolor_image(image: Image.Image, new_color: str) -> Image.Image:
     global palette
     # Create a new image to avoid modifying the original
     recolored_image = image.copy().convert('RGBA')
-    pixels = recolored_image.load()
     # recolor based on palette dictionary
     if new_color not in palette:
         logger.warning(f"Palette color '{new_color}' not found. Using original image.")
@@ -816,56 +1715,117 @@ def recolor_image(image: Image.Image, new_color: str) -> Image.Image:
     new_g = palette[new_color].get('g', 0)
     new_b = palette[new_color].get('b', 0)
     
-    for y in range(recolored_image.height):
-        for x in range(recolored_image.width):
-            r, g, b, a = pixels[x, y]
-            if a == 0:
-                continue  # skip transparent pixels
-            # set the color of the pixel to the new color from the palette
-            pixels[x, y] = (new_r, new_g, new_b, a)
-    return recolored_image
+    alpha = recolored_image.getchannel('A')
+    solid_image = Image.new('RGBA', recolored_image.size, (new_r, new_g, new_b, 255))
+    solid_image.putalpha(alpha)
+    # only pixels with a != 0 are recolored, transparent pixels are left as they are
+    mask = alpha.point(OPAQUE_MASK_TABLE)
+    return Image.composite(solid_image, recolored_image, mask)
 
 
+# expanded JSON of a menu, menu JSON files referenced by '_path' keys are kept as paths by load_theme and only
+# loaded and expanded here (the same for a file that was missing when the theme was loaded)
+def menu_json(menu_path, theme_path) -> dict:
+    if isinstance(menu_path, str):
+        return load_json_include(os.path.join(os.path.abspath(theme_path), menu_path), os.path.abspath(theme_path))
+    return menu_path
 
 class generic_menu:
-    def __init__(self, menu_path, theme_path):
+    def __init__(self, menu_path, theme_path, is_status_bar=False):
         logger.debug(f"Initializing generic_menu with menu_path and theme_path: {theme_path}")
-        # Load JSON file if menu_path is a string path
-        logger.debug(f"menu_path type: {type(menu_path)}")
-        logger.debug(f"menu_path value: {menu_path}")
-        if isinstance(menu_path, str):
-            with open(menu_path, 'r', encoding='utf-8') as f:
-                menu_data = json.load(f)
-        else:
-            menu_data = menu_path
-        # menu_data is a dict, so use make_paths_absolute
-        self.menu_data = make_paths_absolute(menu_data, theme_path)
+        # the paths in menu_data are already absolute, load_theme expands the theme against its absolute path
+        # (loaded_data is the JSON before a template replaced it, compiled bundles store it)
+        self.loaded_data = menu_json(menu_path, theme_path)
+        menu_data = self.loaded_data
+        if 'template' in menu_data:
+            menu_data = menu_data['template']
+        self.menu_data = menu_data
         self.theme_path = theme_path
-        
-        
-        self.menu_items = self.menu_data['menu_items'] if 'menu_items' in self.menu_data else []
-        logging.debug(f"Menu items loaded.")
-        
-        self.pages = self.menu_data['pages'] if 'pages' in self.menu_data else []
-        logging.debug(f"Menu pages loaded.")
-        
-        
-        
+    
+        if is_status_bar:
+            self.model = build_status_bar_model(menu_data)
+            self.menu_items = []
+            self.pages = []
+        else:
+            # a template menu keeps the menu items and pages of the menu itself, like load_menu always did
+            self.model = build_menu_model(menu_data, self.loaded_data)
+            self.menu_items = self.model.menu_items
+            self.pages = self.model.pages
+    
+        # data derived from menu_data for drawing (e.g. composed status bar sprites), it goes away with the menu
+        self.render_cache = {}
+    
         logger.debug(f"Loaded generic menu: {self.menu_data.get('screen_name', 'Unnamed')}")
     
     def get_property(self, property_name):
         return self.menu_data.get(property_name, None)
 
-class page:
-    def __init__(self, page_data: dict):
-        self.page_data = page_data
-        logger.debug(f"Initialized page with data: {page_data}")
+# stands in for a generic_menu and only builds it (loading the JSON and building its model) the first
+# time the menu data is used, normally when update_menu navigates to it
+class lazy_menu:
+    def __init__(self, menu_path, theme_path, is_status_bar=False):
+        self.menu_path = menu_path
+        self.theme_path = theme_path
+        self.is_status_bar = is_status_bar
+        self.menu = None
+        self.lock = threading.Lock()
+    
+    def materialize(self) -> generic_menu:
+        if self.menu is None:
+            with self.lock:
+                if self.menu is None:
+                    self.menu = generic_menu(self.menu_path, self.theme_path, self.is_status_bar)
+        return self.menu
+    
+    @property
+    def menu_data(self):
+        return self.materialize().menu_data
+    
+    @property
+    def loaded_data(self):
+        return self.materialize().loaded_data
+    
+    @property
+    def model(self):
+        return self.materialize().model
+    
+    @property
+    def menu_items(self):
+        return self.materialize().menu_items
+    
+    @property
+    def pages(self):
+        return self.materialize().pages
+    
+    @property
+    def render_cache(self):
+        return self.materialize().render_cache
+    
+    def get_property(self, property_name):
+        return self.materialize().get_property(property_name)
 
+# build all menus and status bars that haven't been used yet on a background thread
+def warm_up_menus(*menu_collections):
+    def warm_up():
+        start = time.perf_counter()
+        count = 0
+        for collection in menu_collections:
+            for name, lazy in list(collection.items()):
+                try:
+                    lazy.materialize()
+                    count += 1
+                except Exception as e:
+                    logger.warning(f"Failed to build menu '{name}' in the background: {e}")
+        logger.debug(f"Warmed up {count} menus in {time.perf_counter() - start:.3f} s")
+    thread = threading.Thread(target=warm_up, name="menu-warm-up", daemon=True)
+    thread.start()
+    return thread
 
 
 # look up functions for menu navigation
 def use_button_map(key: str):
-    global button_map, canvas_screen, menu_items, selected_menu_item, selected_page, pages
+    global button_map, menu_items, selected_menu_item, selected_page, pages
+    previous_item = selected_menu_item
     match button_map[key]:
             case "select":
                 logger.info("Select action triggered.")
@@ -901,26 +1861,38 @@ def use_button_map(key: str):
     # when pages contains data and menu_items is empty, load menu_items from the selected page
     if pages:
         page_data = pages[selected_page]
-        if 'menu_items' in page_data:
-            menu_items = page_data['menu_items']
-            logger.debug(f"Loaded menu items from selected page {selected_page}: " + str(menu_items))
-            if 'button_map' in menu_items[selected_menu_item]:
-                button_map = menu_items[selected_menu_item]['button_map']
-                logger.debug(f"Loaded button map from selected menu item {selected_menu_item}: " + str(button_map))
+        if page_data.menu_items is not None:
+            menu_items = page_data.menu_items
+            logger.debug("Loaded menu items from selected page %s: %s", selected_page, menu_items)
+            if menu_items[selected_menu_item].button_map is not None:
+                button_map = menu_items[selected_menu_item].button_map
+                logger.debug("Loaded button map from selected menu item %s: %s", selected_menu_item, button_map)
+    
+    # only the selection moved on the screen that is shown, so only the two items are redrawn
+    if selected_menu_item != previous_item and frame_key == (menu_target, selected_page, id(menu_items)) and len(item_regions) == len(menu_items):
+        button_map = menu.model.button_map
+        if pages and pages[selected_page].menu_items is not None and menu_items[selected_menu_item].button_map is not None:
+            button_map = menu_items[selected_menu_item].button_map
+        configure_buttons()
+        redraw_selection_change(previous_item)
+        present_frame()
+        if prefetcher is not None:
+            prefetcher.schedule(menu_target, selected_page, selected_menu_item)
+        return
     
     update_menu()
-    canvas_screen.delete("all")
     if pages:
         update_page()
-    render_menu(menu.menu_data)
-    draw_menu_items()
-    draw_status_bar()
+    render_frame(menu.model)
+    present_frame()
 
 
 def select_menu_item():
     global selected_menu_item, menu_items, menu_target, menu_path, selected_page
-    if 0 <= selected_menu_item < len(menu_items):
-        menu_target = menu_items[selected_menu_item]['target']
+    if 0 <= selected_menu_item < len(menu_items) and menu_items[selected_menu_item].target is None:
+        logger.warning(f"Menu item {selected_menu_item} has no target.")
+    elif 0 <= selected_menu_item < len(menu_items):
+        menu_target = menu_items[selected_menu_item].target
         # append the new target to the menu_path
         menu_path.append(menu_target)
         selected_menu_item = 0
@@ -944,12 +1916,12 @@ def next_menu_item():
     global selected_menu_item, menu_items
     #print(menu_items)
     selected_menu_item = (selected_menu_item + 1) % len(menu_items)
-    logger.debug(f"Selected menu item changed to index: {selected_menu_item}, selected item: {menu_items[selected_menu_item]}")
+    logger.debug("Selected menu item changed to index: %s, selected item: %s", selected_menu_item, menu_items[selected_menu_item])
 
 def previous_menu_item():
     global selected_menu_item, menu_items
     selected_menu_item = (selected_menu_item - 1) if selected_menu_item > 0 else len(menu_items) - 1
-    logger.debug(f"Selected menu item changed to index: {selected_menu_item}, selected item: {menu_items[selected_menu_item]}")
+    logger.debug("Selected menu item changed to index: %s, selected item: %s", selected_menu_item, menu_items[selected_menu_item])
 
 def next_page():
     global selected_page, pages
@@ -962,6 +1934,714 @@ def previous_page():
     logger.debug(f"Selected page changed to index: {selected_page}")
 
 
+# Reloading
+# Reloading reuses everything that didn't change: load_theme takes unchanged JSON files from the include cache and the
+# image cache and status bar sprites are keyed by modification time, so only changed files are expanded and decoded.
+
+# load the theme again and redraw the current screen, keeping the breadcrumb, page and selection where they still exist
+def reload_theme(theme_path: str) -> bool:
+    global menus, status_bars, menu, menu_target, menu_path, selected_page, selected_menu_item
+    start = time.perf_counter()
+    try:
+        theme_data = load_theme(theme_path)
+        new_menus = create_menus(theme_data, theme_path)
+        new_status_bars = create_status_bars(theme_data, theme_path)
+    except Exception as e:
+        logger.error(f"Failed to reload theme: {e}")
+        return False
+    if not new_menus:
+        logger.warning("No menus found in theme data after reload.")
+        return False
+    menus = new_menus
+    status_bars = new_status_bars
+    
+    # key of a target whose menu can still be loaded, None if it's gone or broken
+    def loadable_menu(target: str):
+        key = resolve_menu_target(target)
+        if key is None:
+            return None
+        try:
+            menus[key].menu_data
+        except Exception as e:
+            logger.error(f"Failed to load menu '{key}': {e}")
+            return None
+        return key
+    
+    # walk back the breadcrumb until a menu that still exists
+    menu_key = loadable_menu(menu_path[-1])
+    while menu_key is None and len(menu_path) > 1:
+        logger.warning(f"Menu target '{menu_path[-1]}' doesn't exist anymore, going back")
+        menu_path.pop()
+        selected_page = 0
+        selected_menu_item = 0
+        menu_key = loadable_menu(menu_path[-1])
+    if menu_key is None:
+        menu_key = next((key for key in menus if loadable_menu(key) is not None), None)
+        if menu_key is None:
+            logger.error("None of the menus can be loaded after reload.")
+            return False
+        logger.warning(f"Menu target '{menu_path[-1]}' doesn't exist anymore, showing '{menu_key}'")
+        menu_path[:] = [menu_key]
+    menu_target = menu_key
+    menu = menus[menu_target]
+    
+    # keep page and selection inside the (possibly shorter) menu
+    selected_page = min(selected_page, max(len(menu.model.pages) - 1, 0))
+    selected_menu_item = min(selected_menu_item, max(len(menu.model.page_items(selected_page)) - 1, 0))
+    
+    load_menu()
+    logger.info(f"Theme reloaded and '{menu_target}' redrawn in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return True
+
+# files the loaded theme depends on (the expanded JSON files and the files their values point to) and every directory
+# of the theme, adding or removing a file changes the mtime of its directory. Other files aren't polled.
+def watched_paths() -> set:
+    paths = {path for path, kind in theme_index.entries.items() if kind == 'dir'}
+    for _, dependencies, probes in list(json_include_cache.values()):
+        paths.update(dependencies)
+        paths.update(path for path, kind in probes.items() if kind == 'file')
+    return paths
+
+# modification time in ns of a file or directory on disk, None if it doesn't exist
+def stat_mtime(path: str):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+# polls the theme files from the Tk main loop and reloads once the changes stopped for the debounce time
+class theme_watcher:
+    def __init__(self, root, theme_path: str, interval: float, debounce: float):
+        self.root = root
+        self.theme_path = theme_path
+        self.interval_ms = max(int(interval * 1000), 10)
+        self.debounce = debounce
+        self.watched_index = None
+        self.watched_cache_size = None
+        self.paths = []
+        self.snapshot = self.scan()
+        self.changed_since = None
+        self.changed_paths = set()
+    
+    # modification time of the watched paths (or of the bundle file), the paths are only collected again after a
+    # reload or when more JSON files were expanded (menus are loaded when they are first shown)
+    def scan(self) -> dict:
+        if os.path.isfile(self.theme_path):
+            return {self.theme_path: os.stat(self.theme_path).st_mtime_ns}
+        if self.watched_index is not theme_index or self.watched_cache_size != len(json_include_cache):
+            self.watched_index = theme_index
+            self.watched_cache_size = len(json_include_cache)
+            self.paths = sorted(watched_paths())
+        return {path: stat_mtime(path) for path in self.paths}
+    
+    def start(self):
+        logger.info(f"Watching {self.theme_path} for changes")
+        self.root.after(self.interval_ms, self.poll)
+    
+    def poll(self):
+        try:
+            snapshot = self.scan()
+        except OSError as e:
+            logger.warning(f"Couldn't scan {self.theme_path}: {e}")
+            snapshot = self.snapshot
+        # paths that are watched for the first time only set their starting mtime
+        changed = {path for path, mtime in snapshot.items() if path in self.snapshot and self.snapshot[path] != mtime}
+        self.snapshot = snapshot
+        if changed:
+            self.changed_paths.update(changed)
+            self.changed_since = time.perf_counter()  # every further change restarts the debounce time
+        elif self.changed_since is not None and time.perf_counter() - self.changed_since >= self.debounce:
+            logger.info(f"{len(self.changed_paths)} path(s) changed: " + ", ".join(sorted(os.path.relpath(path, self.theme_path) for path in self.changed_paths)[:10]))
+            self.changed_since = None
+            self.changed_paths = set()
+            reload_theme(self.theme_path)
+        self.root.after(self.interval_ms, self.poll)
+
+
+# Prefetching
+# The navigation graph is known up front (item targets, neighbouring pages and items), so after a menu is loaded
+# the images and text runs of the screens one or more steps away are decoded and recolored on a thread pool.
+# Everything ends up in layer_image_cache, the main thread then renders from warm data.
+
+# states reachable with one button press: neighbouring items and pages, and the targets of the items
+def neighbour_states(menu_key: str, page_index: int, item_index: int) -> list:
+    screen = menus[menu_key].model
+    state_pages = screen.pages
+    state_menu_items = screen.page_items(page_index)
+    states = []
+    if len(state_menu_items) > 1:
+        states.append((menu_key, page_index, (item_index + 1) % len(state_menu_items)))
+        states.append((menu_key, page_index, (item_index - 1) % len(state_menu_items)))
+    if len(state_pages) > 1:
+        states.append((menu_key, (page_index + 1) % len(state_pages), 0))
+        states.append((menu_key, (page_index - 1) % len(state_pages), 0))
+    for item in state_menu_items:
+        target_key = resolve_menu_target(item.target) if item.target is not None else None
+        if target_key is not None:
+            states.append((target_key, 0, 0))
+    return states
+
+# decode and recolor everything render_frame needs for a state
+def warm_state(menu_key: str, page_index: int, item_index: int):
+    screen = menus[menu_key].model
+    for layer in screen.background_layers:
+        load_layer_image(layer.image_path)
+    for index, item in enumerate(screen.page_items(page_index)):
+        compile_menu_item(item, index == item_index)
+    if screen.status_bar in status_bars:
+        status_bar_sprite(screen.status_bar)
+
+class menu_prefetcher:
+    def __init__(self, depth: int, workers: int):
+        self.depth = depth
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        # increases with every schedule, work that was scheduled for an older screen is skipped
+        self.generation = 0
+    
+    def schedule(self, menu_key: str, page_index: int, item_index: int):
+        self.generation += 1
+        seen = {(menu_key, page_index, item_index)}
+        frontier = [(menu_key, page_index, item_index)]
+        for _ in range(self.depth):
+            next_frontier = []
+            for state in frontier:
+                try:
+                    states = neighbour_states(*state)
+                except Exception as e:
+                    logger.debug(f"Couldn't find neighbours of {state} to prefetch: {e}")
+                    continue
+                for neighbour in states:
+                    if neighbour not in seen:
+                        seen.add(neighbour)
+                        next_frontier.append(neighbour)
+                        self.executor.submit(self.warm, self.generation, neighbour)
+            frontier = next_frontier
+        logger.debug(f"Scheduled prefetch of {len(seen) - 1} screens around {menu_key}")
+    
+    def warm(self, generation: int, state):
+        if generation != self.generation:
+            return
+        try:
+            with tracer.span("prefetch", menu=state[0], page=state[1], item=state[2]):
+                warm_state(*state)
+        except Exception as e:
+            logger.debug(f"Prefetch of {state} failed: {e}")
+    
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+# prefetcher of the GUI, None when prefetching is disabled or rendering headless
+prefetcher = None
+
+# list every (menu, page, selected item) state of the loaded menus, in the same way load_menu picks the menu items
+def list_menu_states(menus: dict) -> list:
+    states = []
+    for menu_key, state_menu in menus.items():
+        screen = state_menu.model
+        if screen.pages and not screen.menu_items:
+            for page_index in range(len(screen.pages)):
+                for item_index in range(max(len(screen.page_items(page_index)), 1)):
+                    states.append((menu_key, page_index, item_index))
+        else:
+            for item_index in range(max(len(screen.menu_items), 1)):
+                states.append((menu_key, 0, item_index))
+    return states
+
+# set the navigation globals to one state without touching the GUI
+def set_menu_state(menu_key: str, page_index: int, item_index: int):
+    global menu, menu_target, menu_items, pages, selected_page, selected_menu_item, button_map
+    menu_target = menu_key
+    menu = menus[menu_key]
+    selected_page = page_index
+    selected_menu_item = item_index
+    pages = menu.pages
+    menu_items = menu.model.page_items(selected_page)
+    button_map = menu.model.button_map
+
+# file name a rendered state is exported to, relative to the output directory
+def state_file_name(menu_key: str, page_index: int, item_index: int) -> str:
+    return os.path.join(menu_key, f"page{page_index:02d}_item{item_index:02d}.png")
+
+# process pool initializer: every worker loads the theme once into its own globals
+def init_render_worker(theme_path: str, log_level: int, trace: bool = False, image_cache_bytes: int = DEFAULT_IMAGE_CACHE_BYTES):
+    global menus, status_bars
+    logging.basicConfig(level=log_level)
+    layer_image_cache.budget_bytes = image_cache_bytes
+    # a forked worker starts with a copy of the events of the parent, those are already in the parent's trace
+    tracer.events = []
+    tracer.counters = {}
+    if trace:
+        tracer.enable()
+    theme_data = load_theme(theme_path)
+    menus = create_menus(theme_data, theme_path)
+    status_bars = create_status_bars(theme_data, theme_path)
+
+# render a batch of states to PNG files, returns the number of screens written and the trace events of the batch
+def export_states(states: list, output_path: str):
+    exported = 0
+    for menu_key, page_index, item_index in states:
+        try:
+            set_menu_state(menu_key, page_index, item_index)
+            frame = render_frame(menu.model)
+            frame.save(os.path.join(output_path, state_file_name(menu_key, page_index, item_index)))
+            exported += 1
+        except Exception as e:
+            logger.error(f"Failed to render {menu_key} page {page_index} item {item_index}: {e}")
+        tracer.frame_done()
+    return exported, tracer.drain()
+
+# render every menu/page/selection state of a theme to PNG files without opening a window,
+# returns the number of screens written and the number of states of the theme
+def export_theme(theme_path: str, output_path: str, workers: int) -> tuple:
+    theme_data = load_theme(theme_path)
+    states = list_menu_states(create_menus(theme_data, theme_path))
+    logger.info(f"Exporting {len(states)} screens to: {output_path}")
+    for menu_key in {state[0] for state in states}:
+        os.makedirs(os.path.join(output_path, menu_key), exist_ok=True)
+    
+    # group the states in batches so every task renders a few screens, keeping the IPC overhead low
+    workers = max(1, workers)
+    batch_size = max(1, min(32, len(states) // (workers * 4)))
+    batches = [states[i:i + batch_size] for i in range(0, len(states), batch_size)]
+    
+    start = time.perf_counter()
+    exported = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_render_worker, initargs=(theme_path, logger.getEffectiveLevel(), tracer.enabled, layer_image_cache.budget_bytes)) as executor:
+        for batch_exported, events in executor.map(export_states, batches, [output_path] * len(batches)):
+            exported += batch_exported
+            tracer.events.extend(events)
+    elapsed = time.perf_counter() - start
+    
+    print(f"Exported {exported} of {len(states)} screens to '{output_path}' in {elapsed:.2f} s ({exported / elapsed:.1f} screens/s) using {workers} worker(s)")
+    return exported, len(states)
+
+
+# per pixel largest channel difference of two frames, the mask of the pixels above the tolerance and their count
+# works on whole images (ImageChops/point/histogram run in C), no Python loop over pixels
+def compare_frames(frame: Image.Image, golden: Image.Image, tolerance: int):
+    channels = ImageChops.difference(frame, golden).split()
+    largest = channels[0]
+    for channel in channels[1:]:
+        largest = ImageChops.lighter(largest, channel)
+    changed = largest.point(lambda value: 255 if value > tolerance else 0)
+    return largest, changed, changed.histogram()[255]
+
+# golden frame dimmed to gray with the changed pixels colored by how much they changed (red to yellow)
+def diff_heatmap(golden: Image.Image, largest: Image.Image, changed: Image.Image) -> Image.Image:
+    peak = max(largest.getextrema()[1], 1)
+    heat = ImageOps.colorize(largest.point(lambda value: min(255, 64 + value * 191 // peak)), black="black", white="yellow", mid="red")
+    dimmed = golden.convert('L').point(lambda value: value // 4).convert('RGB')
+    return Image.composite(heat, dimmed, changed)
+
+# render a batch of states and compare them with the golden PNGs, returns one result per state and the trace events
+def compare_states(states: list, golden_path: str, diff_path, tolerance: int):
+    results = []
+    for menu_key, page_index, item_index in states:
+        file_name = state_file_name(menu_key, page_index, item_index)
+        result = {"screen": file_name, "status": "ok", "changed_pixels": 0, "max_difference": 0}
+        try:
+            set_menu_state(menu_key, page_index, item_index)
+            frame = render_frame(menu.model)
+            golden_file = os.path.join(golden_path, file_name)
+            if not os.path.isfile(golden_file):
+                result["status"] = "missing"
+            else:
+                with Image.open(golden_file) as golden_image:
+                    golden = golden_image.convert('RGBA')
+                if golden.size != frame.size:
+                    result["status"] = "size"
+                else:
+                    largest, changed, changed_pixels = compare_frames(frame, golden, tolerance)
+                    result["max_difference"] = largest.getextrema()[1]
+                    result["changed_pixels"] = changed_pixels
+                    if changed_pixels:
+                        result["status"] = "changed"
+                        result["bbox"] = changed.getbbox()
+                        if diff_path:
+                            diff_file = os.path.join(diff_path, file_name)
+                            os.makedirs(os.path.dirname(diff_file), exist_ok=True)
+                            diff_heatmap(golden, largest, changed).save(diff_file)
+        except Exception as e:
+            logger.error(f"Failed to render {menu_key} page {page_index} item {item_index}: {e}")
+            result["status"] = "error"
+            result["message"] = str(e)
+        results.append(result)
+        tracer.frame_done()
+    return results, tracer.drain()
+
+# render every screen of a theme and compare it with the golden PNGs written by an earlier --export
+# returns the number of screens that differ, are missing, failed to render, or only exist as golden PNG
+def compare_theme(theme_path: str, golden_path: str, diff_path, tolerance: int, workers: int) -> int:
+    if not os.path.isdir(golden_path):
+        raise FileNotFoundError(f"Golden directory not found: {golden_path}")
+    theme_data = load_theme(theme_path)
+    states = list_menu_states(create_menus(theme_data, theme_path))
+    logger.info(f"Comparing {len(states)} screens with: {golden_path}")
+    
+    workers = max(1, workers)
+    batch_size = max(1, min(32, len(states) // (workers * 4)))
+    batches = [states[i:i + batch_size] for i in range(0, len(states), batch_size)]
+    
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_render_worker, initargs=(theme_path, logger.getEffectiveLevel(), tracer.enabled, layer_image_cache.budget_bytes)) as executor:
+        for batch_results, events in executor.map(compare_states, batches, [golden_path] * len(batches), [diff_path] * len(batches), [tolerance] * len(batches)):
+            results.extend(batch_results)
+            tracer.events.extend(events)
+    elapsed = time.perf_counter() - start
+    
+    # golden PNGs of screens the theme doesn't have anymore
+    rendered = {result["screen"] for result in results}
+    stale = []
+    for dir_path, _, file_names in os.walk(golden_path):
+        for file_name in sorted(file_names):
+            if file_name.endswith('.png'):
+                relative = os.path.relpath(os.path.join(dir_path, file_name), golden_path)
+                if relative not in rendered:
+                    stale.append(relative)
+    
+    failed = [result for result in results if result["status"] != "ok"]
+    for result in failed:
+        if result["status"] == "changed":
+            print(f"CHANGED {result['screen']}: {result['changed_pixels']} pixels, max difference {result['max_difference']}, bbox {result['bbox']}")
+        elif result["status"] == "missing":
+            print(f"MISSING {result['screen']}: no golden image")
+        elif result["status"] == "size":
+            print(f"SIZE    {result['screen']}: golden image has a different size")
+        else:
+            print(f"ERROR   {result['screen']}: {result.get('message', '')}")
+    for relative in stale:
+        print(f"STALE   {relative}: golden image without a screen")
+    
+    print(f"Compared {len(results)} screens with '{golden_path}' in {elapsed:.2f} s ({len(results) / elapsed:.1f} screens/s) using {workers} worker(s): "
+          f"{len(results) - len(failed)} identical, {len(failed)} different, {len(stale)} stale (tolerance {tolerance})")
+    return len(failed) + len(stale)
+
+
+# Memory report
+# Walks the screens like the renderer does but only looks at image sizes (PNG headers or bundle entries), so even
+# large themes are reported without decoding or drawing anything.
+
+# width * height * 4 of an image once it is decoded to RGBA, sizes are cached in image_sizes
+def decoded_image_bytes(image_path: str, image_sizes: dict) -> int:
+    if image_path not in image_sizes:
+        image = theme_bundle.image(image_path) if theme_bundle is not None else None
+        if image is not None:
+            width, height = image.size
+        else:
+            with Image.open(image_path) as header:  # only the header is read for the size
+                width, height = header.size
+        image_sizes[image_path] = width * height * 4
+    return image_sizes[image_path]
+
+# decoded bytes and draw operations of one menu/page/selection state
+# images are counted once per (path, recolor color) as the renderer keeps one decoded copy of each,
+# glyphs once per (size, character), every image, glyph, fill and text drawn counts as a draw operation
+def screen_footprint(menu_key: str, page_index: int, item_index: int, image_sizes: dict) -> dict:
+    set_menu_state(menu_key, page_index, item_index)
+    screen = menu.model
+    images = {}
+    glyphs = {}
+    ops = 0
+    
+    if screen.background_color is not None:
+        ops += 1
+    for layer in screen.background_layers:
+        images[(layer.image_path, None)] = decoded_image_bytes(layer.image_path, image_sizes)
+        ops += 1
+    if screen.title is not None:
+        ops += 1
+    ops += len(screen.labels)
+    
+    for index, item in enumerate(menu_items):
+        for layer in item.selected_layers if index == selected_menu_item else item.layers:
+            if type(layer) is text_layer_model:
+                atlas = load_glyph_atlas(layer.font_size)
+                for char in layer.text:
+                    glyph = atlas.get(char)
+                    if glyph is not None:
+                        glyphs[(layer.font_size, char)] = glyph.width * glyph.height * 4
+                        ops += 1
+            else:
+                images[(layer.image_path, layer.recolor_palette)] = decoded_image_bytes(layer.image_path, image_sizes)
+                ops += 1
+    
+    status_bar = status_bars.get(screen.status_bar)
+    if status_bar is not None:
+        states = status_bar_states()
+        for status_bar_item_name, status_bar_item in status_bar.model.items.items():
+            layer = status_bar_item.states.get(states.get(status_bar_item_name))
+            if layer is not None:
+                images[(layer.image_path, None)] = decoded_image_bytes(layer.image_path, image_sizes)
+                ops += 1
+    
+    return {
+        "screen": state_file_name(menu_key, page_index, item_index),
+        "image_bytes": sum(images.values()),
+        "glyph_bytes": sum(glyphs.values()),
+        "decoded_bytes": sum(images.values()) + sum(glyphs.values()),
+        "images": len(images),
+        "glyphs": len(glyphs),
+        "draw_ops": ops,
+    }
+
+# write the footprint of every screen of a theme to a JSON file and list the screens over budget
+# returns the number of screens over budget
+def memory_report(theme_path: str, report_path: str, budget_bytes: int, budget_ops: int) -> int:
+    global menus, status_bars
+    start = time.perf_counter()
+    theme_data = load_theme(theme_path)
+    menus = create_menus(theme_data, theme_path)
+    status_bars = create_status_bars(theme_data, theme_path)
+    
+    image_sizes = {}
+    screens = []
+    for state in list_menu_states(menus):
+        try:
+            footprint = screen_footprint(*state, image_sizes)
+        except Exception as e:
+            logger.error(f"Failed to walk {state[0]} page {state[1]} item {state[2]}: {e}")
+            continue
+        footprint["over_budget"] = footprint["decoded_bytes"] > budget_bytes or (budget_ops > 0 and footprint["draw_ops"] > budget_ops)
+        screens.append(footprint)
+    elapsed = time.perf_counter() - start
+    
+    over_budget = [footprint for footprint in screens if footprint["over_budget"]]
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            "theme": theme_path,
+            "budget_bytes": budget_bytes,
+            "budget_ops": budget_ops,
+            "screens": screens,
+        }, f, indent=2)
+    
+    for footprint in over_budget:
+        print(f"OVER BUDGET {footprint['screen']}: {footprint['decoded_bytes']} bytes ({footprint['images']} images, {footprint['glyphs']} glyphs), {footprint['draw_ops']} draw ops")
+    if screens:
+        heaviest = max(screens, key=lambda footprint: footprint["decoded_bytes"])
+        print(f"Heaviest screen: {heaviest['screen']} with {heaviest['decoded_bytes']} bytes and {heaviest['draw_ops']} draw ops")
+    print(f"Reported {len(screens)} screens to '{report_path}' in {elapsed:.2f} s: {len(over_budget)} over budget ({budget_bytes} bytes" + (f", {budget_ops} draw ops)" if budget_ops > 0 else ")"))
+    return len(over_budget)
+
+
+# Button recording and replay
+# --record keeps the buttons pressed in the GUI and writes them on exit, --replay feeds them to use_button_map
+# without a window and times every step and the update_menu/update_page/render spans inside it
+
+button_recording = None
+
+def start_recording(record_path: str):
+    global button_recording
+    button_recording = {"menu_path": list(menu_path), "start": time.perf_counter(), "buttons": []}
+    atexit.register(write_recording, record_path)
+
+def record_button(key: str):
+    if button_recording is not None:
+        button_recording["buttons"].append({"button": key, "time": round(time.perf_counter() - button_recording["start"], 3)})
+
+def write_recording(record_path: str):
+    with open(record_path, 'w', encoding='utf-8') as f:
+        json.dump({"menu_path": button_recording["menu_path"], "buttons": button_recording["buttons"]}, f, indent=1)
+    logger.info(f"Recorded {len(button_recording['buttons'])} button presses to: {record_path}")
+
+# nearest-rank percentile of a list of numbers
+def percentile(values: list, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered), max(1, math.ceil(len(ordered) * p / 100))) - 1]
+
+# timings of one kind, in milliseconds
+def latency_summary(values: list) -> dict:
+    return {
+        "count": len(values),
+        "p50": round(percentile(values, 50), 3),
+        "p90": round(percentile(values, 90), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(max(values), 3),
+    }
+
+REPLAY_SPANS = {"update_menu": "update_menu", "update_page": "update_page", "render_frame": "render", "redraw_selection_change": "render"}
+
+# spans of REPLAY_SPANS that are not inside another one of them, e.g. the render_frame of load_menu is part of
+# update_menu, so the parts of a step add up to at most its latency
+def outer_replay_spans(events: list) -> list:
+    spans = [event for event in events if event.get('ph') == 'X' and event['name'] in REPLAY_SPANS]
+    return [span for span in spans if not any(
+        other is not span and other['tid'] == span['tid'] and other['ts'] <= span['ts'] and span['ts'] + span['dur'] <= other['ts'] + other['dur']
+        and (other['ts'], -other['dur']) < (span['ts'], -span['dur'])
+        for other in spans)]
+
+# replay a recording as fast as possible and print the latency percentiles per menu the button was pressed in
+def replay_buttons(theme_path: str, recording_path: str, report_path, rounds: int):
+    global menus, status_bars, menu, menu_target, menu_path, selected_menu_item, selected_page
+    with open(recording_path, 'r', encoding='utf-8') as f:
+        recording = json.load(f)
+    buttons = [press["button"] for press in recording["buttons"]]
+    
+    theme_data = load_theme(theme_path)
+    menus = create_menus(theme_data, theme_path)
+    status_bars = create_status_bars(theme_data, theme_path)
+    
+    # the timing spans come from the tracer, the events stay in the trace when --trace is given
+    keep_events = tracer.enabled
+    tracer.enable()
+    steps = []
+    for round_index in range(rounds):
+        menu_path = list(recording["menu_path"])
+        menu_target = resolve_menu_target(menu_path[-1])
+        if menu_target is None:
+            raise ValueError(f"Start menu '{menu_path[-1]}' of the recording is not in the theme")
+        menu = menus[menu_target]
+        selected_menu_item = 0
+        selected_page = 0
+        load_menu()
+        
+        for step_index, key in enumerate(buttons):
+            step = {"round": round_index, "step": step_index, "button": key, "menu": menu_target, "update_menu": 0.0, "update_page": 0.0, "render": 0.0}
+            first_event = len(tracer.events)
+            start = time.perf_counter()
+            try:
+                use_button_map(key)
+            except Exception as e:
+                logger.error(f"Step {step_index} ({key} in {step['menu']}) failed: {e!r}")
+                step["error"] = repr(e)
+            step["latency"] = (time.perf_counter() - start) * 1000
+            for event in outer_replay_spans(tracer.events[first_event:]):
+                step[REPLAY_SPANS[event['name']]] += event['dur'] / 1000
+            if not keep_events:
+                tracer.drain()
+            steps.append(step)
+    tracer.enabled = keep_events
+    
+    per_menu = {}
+    for step in steps:
+        per_menu.setdefault(step["menu"], []).append(step)
+    summary = {}
+    print(f"{'menu':<32} {'steps':>6} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}  update_menu/update_page/render p50 ms")
+    for menu_key, menu_steps in per_menu.items():
+        summary[menu_key] = {name: latency_summary([step[name] for step in menu_steps]) for name in ("latency", "update_menu", "update_page", "render")}
+        latency = summary[menu_key]["latency"]
+        print(f"{menu_key:<32} {latency['count']:>6} {latency['p50']:>8.2f} {latency['p90']:>8.2f} {latency['p99']:>8.2f} {latency['max']:>8.2f}  "
+              f"{summary[menu_key]['update_menu']['p50']:.2f}/{summary[menu_key]['update_page']['p50']:.2f}/{summary[menu_key]['render']['p50']:.2f}")
+    if steps:
+        overall = latency_summary([step["latency"] for step in steps])
+        print(f"Replayed {len(steps)} steps ({len(buttons)} buttons x {rounds} round(s)): p50 {overall['p50']:.2f} ms, p90 {overall['p90']:.2f} ms, p99 {overall['p99']:.2f} ms, max {overall['max']:.2f} ms")
+    
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump({"theme": theme_path, "recording": recording_path, "rounds": rounds, "menus": summary, "steps": steps}, f, indent=1)
+
+
+# Navigation explorer
+# Breadth-first search over (menu, page, selected item) states from the start menu, following the actions the button
+# map of every state gives the six pager buttons the same way use_button_map would. 'back' only returns to a state
+# that was already visited, so it adds no states.
+
+PAGER_BUTTONS = ("a", "b", "up", "down", "left", "right")
+
+# states one button press away: (button, action, next state) and problems as (kind, button, action, detail)
+def state_transitions(menu_key: str, page_index: int, item_index: int):
+    screen = menus[menu_key].model
+    state_pages = screen.pages
+    state_menu_items = screen.page_items(page_index)
+    button_actions = screen.state_button_map(page_index, item_index)
+    transitions = []
+    problems = []
+    
+    def page_move(button, action, new_page):
+        page_items = screen.page_items(new_page)
+        if page_items and item_index >= len(page_items):
+            problems.append(("broken", button, action, f"item index {item_index} is out of range on page {new_page}"))
+        else:
+            transitions.append((button, action, (menu_key, new_page, item_index)))
+    
+    for button in PAGER_BUTTONS:
+        if button not in button_actions:
+            problems.append(("broken", button, None, "button is not in the button map"))
+            continue
+        action = button_actions[button]
+        if action == "select":
+            if not 0 <= item_index < len(state_menu_items):
+                continue
+            item = state_menu_items[item_index]
+            if item.target is None:
+                problems.append(("broken", button, action, "selected item has no target"))
+                continue
+            target_key = resolve_menu_target(item.target)
+            if target_key is None:
+                problems.append(("dead_target", button, action, item.target))
+            else:
+                transitions.append((button, action, (target_key, 0, 0)))
+        elif action in ("next", "previous") and len(state_menu_items) > 1:
+            step = 1 if action == "next" else -1
+            transitions.append((button, action, (menu_key, page_index, (item_index + step) % len(state_menu_items))))
+        elif action in ("next", "next_page"):
+            if not state_pages:
+                problems.append(("broken", button, action, "menu has no pages to move to"))
+            else:
+                page_move(button, action, (page_index + 1) % len(state_pages))
+        elif action in ("previous", "previous_page"):
+            if state_pages:
+                page_move(button, action, (page_index - 1) % len(state_pages))
+    return transitions, problems
+
+# explore all states reachable from start_key, returns the report as a dict
+def explore_menus(start_key: str) -> dict:
+    depths = {(start_key, 0, 0): 0}
+    queue = deque([(start_key, 0, 0)])
+    dead_targets = []
+    broken = []
+    while queue:
+        state = queue.popleft()
+        transitions, problems = state_transitions(*state)
+        for button, action, next_state in transitions:
+            if next_state not in depths:
+                depths[next_state] = depths[state] + 1
+                queue.append(next_state)
+        for kind, button, action, detail in problems:
+            entry = {"screen": state_file_name(*state), "button": button, "action": action}
+            if kind == "dead_target":
+                dead_targets.append(dict(entry, target=detail))
+            else:
+                broken.append(dict(entry, problem=detail))
+    
+    reached_menus = {menu_key for menu_key, _, _ in depths}
+    return {
+        "start": start_key,
+        "states": len(depths),
+        "max_depth": max(depths.values()),
+        "dead_targets": dead_targets,
+        "broken_transitions": broken,
+        "unreachable_menus": [menu_key for menu_key in menus if menu_key not in reached_menus],
+        "depths": {state_file_name(*state): depth for state, depth in depths.items()},
+    }
+
+# explore a theme from its start menu and write the report, returns the number of problems found
+def explore_theme(theme_path: str, start_target: str, report_path: str) -> int:
+    global menus, status_bars
+    start = time.perf_counter()
+    theme_data = load_theme(theme_path)
+    menus = create_menus(theme_data, theme_path)
+    status_bars = create_status_bars(theme_data, theme_path)
+    start_key = resolve_menu_target(start_target)
+    if start_key is None:
+        raise ValueError(f"Start menu '{start_target}' is not in the theme")
+    report = explore_menus(start_key)
+    elapsed = time.perf_counter() - start
+    report["seconds"] = round(elapsed, 4)
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
+    
+    for dead in report["dead_targets"]:
+        print(f"DEAD TARGET {dead['screen']}: {dead['button']} ({dead['action']}) leads to '{dead['target']}'")
+    for entry in report["broken_transitions"]:
+        print(f"BROKEN      {entry['screen']}: {entry['button']} ({entry['action']}): {entry['problem']}")
+    for menu_key in report["unreachable_menus"]:
+        print(f"UNREACHABLE {menu_key}")
+    print(f"Explored {report['states']} states from '{start_key}' in {elapsed:.2f} s: max depth {report['max_depth']}, "
+          f"{len(report['dead_targets'])} dead targets, {len(report['broken_transitions'])} broken transitions, {len(report['unreachable_menus'])} unreachable menus")
+    return len(report["dead_targets"]) + len(report["broken_transitions"]) + len(report["unreachable_menus"])
+
+
 # Entry point
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,260 @@
+# Static validation of themes for the theme test tool
+# Loads every theme with load_theme, create_menus and create_status_bars (no Tk window) and walks every menu, page,
+# menu item, layer and status bar layer looking for problems that otherwise only show up when the screen is opened:
+# targets that lead nowhere, image_path files that don't exist, unknown palette names and missing status bar states.
+# Themes are validated in parallel, one theme per worker process, and the result is written as a JSON report.
+# The exit code is 1 when a theme has errors (or warnings with --strict), so it can gate merges.
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import theme_test
+
+
+BUTTON_ACTIONS = {"select", "back", "previous", "next", "previous_page", "next_page", "noop"}
+PAGER_BUTTONS = ("a", "b", "up", "down", "left", "right")
+FONT_SIZES = ("small", "medium", "large")
+
+
+# collects the problems of one theme
+class theme_report:
+    def __init__(self, theme_path: str):
+        self.theme_path = theme_path
+        self.issues = []
+        self.counts = {"menus": 0, "pages": 0, "menu_items": 0, "layers": 0, "status_bars": 0}
+
+    def error(self, code: str, location: str, message: str):
+        self.issues.append({"severity": "error", "code": code, "location": location, "message": message})
+
+    def warning(self, code: str, location: str, message: str):
+        self.issues.append({"severity": "warning", "code": code, "location": location, "message": message})
+
+    def as_dict(self, seconds: float) -> dict:
+        return {
+            "theme": self.theme_path,
+            "errors": sum(1 for issue in self.issues if issue["severity"] == "error"),
+            "warnings": sum(1 for issue in self.issues if issue["severity"] == "warning"),
+            "counts": self.counts,
+            "seconds": round(seconds, 4),
+            "issues": self.issues,
+        }
+
+
+# every theme below the given paths: a theme directory (with theme.json), a compiled bundle, or a directory of themes
+def find_themes(paths: list) -> list:
+    themes = []
+    for path in paths:
+        if os.path.isfile(path) or os.path.isfile(os.path.join(path, "theme.json")):
+            themes.append(path)
+            continue
+        for dir_path, dir_names, file_names in os.walk(path):
+            dir_names.sort()
+            if "theme.json" in file_names:
+                themes.append(dir_path)
+                dir_names.clear()  # assets and menus of a theme are not themes of their own
+    return themes
+
+
+def check_image(report: theme_report, location: str, layer: dict):
+    if 'image_path' in layer and theme_test.path_kind(layer['image_path']) != 'file':
+        report.error("missing_image", location, f"Image file not found: {layer['image_path']}")
+
+
+def check_palette_name(report: theme_report, location: str, layer: dict, key: str):
+    if key in layer and layer[key] not in theme_test.palette:
+        report.warning("unknown_palette", location, f"{key} '{layer[key]}' is not in the color palette")
+
+
+def check_button_map(report: theme_report, location: str, button_map):
+    if not isinstance(button_map, dict):
+        report.error("invalid_button_map", location, "button_map is not an object")
+        return
+    for button in PAGER_BUTTONS:
+        if button not in button_map:
+            report.error("incomplete_button_map", location, f"button_map has no action for button '{button}'")
+    for button, action in button_map.items():
+        if action not in BUTTON_ACTIONS:
+            report.warning("unknown_button_action", location, f"Button '{button}' is mapped to unknown action '{action}'")
+
+
+# layers of a menu item, with the checks render_frame would otherwise fail or warn on
+def check_item_layers(report: theme_report, location: str, layers: list, glyphs: dict):
+    for index, layer in enumerate(layers):
+        layer_location = f"{location}[{index}]"
+        report.counts["layers"] += 1
+        if not isinstance(layer, dict):
+            report.error("invalid_layer", layer_location, "Layer is not an object")
+            continue
+        check_image(report, layer_location, layer)
+        check_palette_name(report, layer_location, layer, 'recolor_palette')
+        check_palette_name(report, layer_location, layer, 'text_color_palette')
+        if 'text' in layer:
+            font_size = layer.get('text_size', 'medium')
+            if font_size not in FONT_SIZES:
+                report.warning("unknown_text_size", layer_location, f"text_size '{font_size}' is drawn as medium")
+                font_size = "medium"
+            missing = sorted(set(str(layer['text'])) - set(glyphs[font_size]))
+            if missing:
+                report.warning("missing_glyph", layer_location, f"No {font_size} glyph for: {''.join(missing)!r}")
+
+
+def check_menu_items(report: theme_report, location: str, menu_items: list, glyphs: dict):
+    for index, item in enumerate(menu_items):
+        item_location = f"{location}[{index}]"
+        report.counts["menu_items"] += 1
+        if 'target' not in item:
+            report.warning("missing_target", item_location, "Menu item has no target, selecting it does nothing")
+        elif theme_test.resolve_menu_target(item['target']) is None:
+            report.error("broken_target", item_location, f"Target '{item['target']}' is not a menu of the theme")
+        if 'selected_layers' not in item:
+            report.warning("missing_selected_layers", item_location, "Menu item has no selected_layers, nothing is drawn for it while it is selected")
+        else:
+            check_item_layers(report, f"{item_location}/selected_layers", item['selected_layers'], glyphs)
+        check_item_layers(report, f"{item_location}/layers", item.get('layers', []), glyphs)
+        if 'button_map' in item:
+            check_button_map(report, f"{item_location}/button_map", item['button_map'])
+
+
+# menu_data is the menu JSON as loaded: a template menu is drawn with its template (background, button_map,
+# status_bar), but navigates its own menu_items and pages
+def check_menu(report: theme_report, menu_key: str, menu_data: dict, glyphs: dict):
+    report.counts["menus"] += 1
+    screen_data = menu_data.get('template', menu_data)
+    screen_key = f"{menu_key}/template" if 'template' in menu_data else menu_key
+    if 'background' not in screen_data:
+        report.warning("missing_background", screen_key, "Menu has no background, it is drawn on black")
+    else:
+        for index, layer in enumerate(screen_data['background'].get('layers', [])):
+            layer_location = f"{screen_key}/background/layers[{index}]"
+            report.counts["layers"] += 1
+            check_image(report, layer_location, layer)
+            if 'image_path' in layer and ('x' not in layer or 'y' not in layer):
+                report.warning("missing_position", layer_location, "Background layer image has no x/y, it is drawn at 0")
+    if 'button_map' in screen_data:
+        check_button_map(report, f"{screen_key}/button_map", screen_data['button_map'])
+    if 'status_bar' in screen_data and screen_data['status_bar'] not in theme_test.status_bars:
+        report.error("unknown_status_bar", screen_key, f"Status bar '{screen_data['status_bar']}' is not defined in status_bars")
+
+    menu_items = menu_data.get('menu_items', [])
+    check_menu_items(report, f"{menu_key}/menu_items", menu_items, glyphs)
+    for page_index, page_data in enumerate(menu_data.get('pages', [])):
+        report.counts["pages"] += 1
+        if not menu_items and not page_data.get('menu_items'):
+            report.warning("empty_page", f"{menu_key}/pages[{page_index}]", "Page has no menu items")
+        check_menu_items(report, f"{menu_key}/pages[{page_index}]/menu_items", page_data.get('menu_items', []), glyphs)
+
+
+def check_status_bar(report: theme_report, name: str, status_bar_data: dict):
+    report.counts["status_bars"] += 1
+    location = f"status_bars/{name}"
+    if "status_bar_items" not in status_bar_data:
+        report.error("missing_status_bar_items", location, "Status bar has no status_bar_items")
+        return
+    states = theme_test.status_bar_states()
+    for item_name, status_bar_item in status_bar_data["status_bar_items"].items():
+        if item_name not in states:
+            continue  # Time isn't drawn
+        layers = status_bar_item.get('layers', {})
+        if states[item_name] not in layers:
+            report.warning("missing_status_state", f"{location}/{item_name}", f"No layer for the default state '{states[item_name]}'")
+        for state, state_layers in layers.items():
+            for index, layer in enumerate(state_layers):
+                layer_location = f"{location}/{item_name}/layers/{state}[{index}]"
+                report.counts["layers"] += 1
+                check_image(report, layer_location, layer)
+                check_palette_name(report, layer_location, layer, 'recolor_palette')
+                if 'image_path' in layer and item_name != "Brightness" and ('x' not in layer or 'y' not in layer):
+                    report.warning("missing_position", layer_location, "Status bar layer image has no x/y, it is drawn at the item position")
+
+
+# validate one theme, runs in a worker process
+def validate_theme(theme_path: str) -> dict:
+    start = time.perf_counter()
+    report = theme_report(theme_path)
+    try:
+        theme_data = theme_test.load_theme(theme_path)
+        theme_test.menus = theme_test.create_menus(theme_data, theme_path)
+        theme_test.status_bars = theme_test.create_status_bars(theme_data, theme_path)
+    except Exception as e:
+        report.error("theme_load", theme_path, f"Failed to load theme: {e}")
+        return report.as_dict(time.perf_counter() - start)
+
+    glyphs = {font_size: theme_test.load_glyph_atlas(font_size) for font_size in FONT_SIZES}
+    if not theme_test.menus:
+        report.error("no_menus", theme_path, "No menus found in theme data")
+    for menu_key, menu in theme_test.menus.items():
+        try:
+            menu_data = menu.loaded_data
+        except Exception as e:
+            report.error("menu_load", menu_key, f"Failed to load menu: {e}")
+            continue
+        try:
+            check_menu(report, menu_key, menu_data, glyphs)
+        except (AttributeError, KeyError, TypeError) as e:
+            report.error("invalid_menu", menu_key, f"Menu data is malformed: {e!r}")
+    for name, status_bar in theme_test.status_bars.items():
+        try:
+            check_status_bar(report, name, status_bar.menu_data)
+        except Exception as e:
+            report.error("invalid_status_bar", f"status_bars/{name}", f"Failed to load status bar: {e!r}")
+    return report.as_dict(time.perf_counter() - start)
+
+
+def init_validate_worker(log_level: int):
+    logging.basicConfig(level=log_level)
+    theme_test.logger.setLevel(log_level)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate themes without opening the theme test tool")
+    parser.add_argument("themes", nargs="+", help="Theme directories, compiled theme bundles or directories containing themes")
+    parser.add_argument("--report", type=str, default=None, help="Write the JSON report to this file (default: print it)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument("--strict", action="store_true", help="Also fail on warnings")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Show the log output of the theme loader")
+    args = parser.parse_args()
+
+    themes = find_themes(args.themes)
+    if not themes:
+        print("No themes found", file=sys.stderr)
+        sys.exit(2)
+
+    start = time.perf_counter()
+    log_level = logging.INFO if args.verbose else logging.CRITICAL
+    if args.workers <= 1 or len(themes) == 1:
+        init_validate_worker(log_level)
+        results = [validate_theme(theme_path) for theme_path in themes]
+    else:
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(themes)), initializer=init_validate_worker, initargs=(log_level,)) as executor:
+            results = list(executor.map(validate_theme, themes))
+    elapsed = time.perf_counter() - start
+
+    report = {
+        "summary": {
+            "themes": len(results),
+            "errors": sum(result["errors"] for result in results),
+            "warnings": sum(result["warnings"] for result in results),
+            "failed_themes": [result["theme"] for result in results if result["errors"] or (args.strict and result["warnings"])],
+            "seconds": round(elapsed, 3),
+        },
+        "themes": results,
+    }
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    for result in results:
+        print(f"{result['theme']}: {result['errors']} error(s), {result['warnings']} warning(s)", file=sys.stderr)
+    print(f"Validated {len(results)} theme(s) in {elapsed:.2f} s", file=sys.stderr)
+    sys.exit(1 if report["summary"]["failed_themes"] else 0)
+
+
+if __name__ == "__main__":
+    main()